@@ -1,13 +1,25 @@
 import django_filters
-from django_filters.filters import ModelMultipleChoiceFilter, NumberFilter
+from django_filters.filters import (BaseInFilter, ModelMultipleChoiceFilter,
+                                    NumberFilter)
 from django_filters.rest_framework import FilterSet, filters
+from recipes import recipe_index
 from recipes.models import Ingredient, Recipe, Tag
+from recipes.search import search_recipes
+
+
+class NumberInFilter(BaseInFilter, NumberFilter):
+    """Фильтр по списку чисел через запятую"""
 
 
 class IngredientFilter(FilterSet):
-    """Фильтр по названию"""
+    """Фильтр по названию.
+
+    Запросы с name обслуживаются индексом recipes.ingredient_index
+    в IngredientViewSet.list, фильтр описывает параметр и служит
+    запасным вариантом.
+    """
 
-    name = filters.CharFilter(lookup_expr='startswith')
+    name = filters.CharFilter(lookup_expr='istartswith')
 
     class Meta:
         model = Ingredient
@@ -15,7 +27,7 @@ class IngredientFilter(FilterSet):
 
 
 class RecipeFilter(django_filters.FilterSet):
-    """ Фильтр избранного и списка покупок"""
+    """ Фильтр избранного, списка покупок и поиска по тексту"""
 
     tags = ModelMultipleChoiceFilter(
         queryset=Tag.objects.all(),
@@ -28,20 +40,30 @@ class RecipeFilter(django_filters.FilterSet):
     is_in_shopping_cart = NumberFilter(
         method='is_recipe_in_shoppingcart_filter'
     )
+    search = filters.CharFilter(method='search_filter')
+    ingredients = NumberInFilter(method='ingredients_filter')
+    exclude_ingredients = NumberInFilter(method='ingredients_filter')
 
     def is_recipe_in_favorites_filter(self, queryset, name, value):
         if value == 1:
-            user = self.request.user
-            return queryset.filter(favoriting__user_id=user.id)
+            return queryset.filter(is_favorited=True)
         return queryset
 
     def is_recipe_in_shoppingcart_filter(self, queryset, name, value):
         if value == 1:
-            user = self.request.user
-            return queryset.filter(shopping_cart__user_id=user.id)
+            return queryset.filter(is_in_shopping_cart=True)
         return queryset
 
+    def search_filter(self, queryset, name, value):
+        return search_recipes(queryset, value)
+
+    def ingredients_filter(self, queryset, name, value):
+        if name == 'ingredients':
+            return recipe_index.filter_recipes(queryset, include=value)
+        return recipe_index.filter_recipes(queryset, exclude=value)
+
     class Meta:
 
         model = Recipe
-        fields = ('tags', 'author', 'is_favorited', 'is_in_shopping_cart')
+        fields = ('tags', 'author', 'is_favorited', 'is_in_shopping_cart',
+                  'search', 'ingredients', 'exclude_ingredients')
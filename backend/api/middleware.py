@@ -0,0 +1,235 @@
+import json
+import logging
+import random
+import time
+import traceback
+from collections import Counter
+
+from django.conf import settings
+from django.db import connection
+from foodgram import metrics
+
+logger = logging.getLogger('api.timing')
+
+DEFAULTS = {
+    'ENABLED': False,
+    'SAMPLE_RATE': 1.0,
+    'DUPLICATE_THRESHOLD': 3,
+    'SLOW_MS': 500,
+}
+SQL_PREVIEW = 200
+
+
+class RequestTiming:
+    """Замеры одного запроса: SQL, представление, рендеринг и повторы.
+
+    view_time заполняет TimingMixin представления, serializer_time —
+    TimedRendererMixin рендерера.
+    """
+
+    def __init__(self, threshold):
+        self.threshold = threshold
+        self.queries = 0
+        self.db_time = 0.0
+        self.view_time = 0.0
+        self.serializer_time = 0.0
+        self.patterns = Counter()
+        self.sites = {}
+        self.view = (None, None)
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+            self.patterns[sql] += 1
+            if self.patterns[sql] == self.threshold:
+                self.sites[sql] = call_site()
+
+    def duplicates(self):
+        return [
+            {
+                'sql': sql[:SQL_PREVIEW],
+                'count': count,
+                'site': self.sites.get(sql),
+            }
+            for sql, count in self.patterns.most_common()
+            if count >= self.threshold
+        ]
+
+
+def call_site():
+    """Функция для поиска строки кода проекта, выполнившей запрос"""
+
+    root = str(settings.BASE_DIR)
+    for frame in reversed(traceback.extract_stack()):
+        if (frame.filename.startswith(root)
+                and frame.filename != __file__
+                and 'site-packages' not in frame.filename):
+            return (f'{frame.filename[len(root) + 1:]}:{frame.lineno} '
+                    f'in {frame.name}')
+    return None
+
+
+def wrap_streaming(response, wrapper, on_close):
+    """Функция для учета запросов, выполненных при отдаче потока.
+
+    Тело StreamingHttpResponse читается уже после выхода из
+    middleware, поэтому итератор тела оборачивается: запросы к базе
+    внутри него проходят через wrapper, а после отдачи последнего
+    куска вызывается on_close(размер тела в байтах).
+    """
+
+    content = response.streaming_content
+
+    def stream():
+        size = 0
+        try:
+            with connection.execute_wrapper(wrapper):
+                for chunk in content:
+                    size += len(chunk)
+                    yield chunk
+        finally:
+            on_close(size)
+
+    response.streaming_content = stream()
+
+
+def view_name(view_func):
+    """Функция для получения имени представления и действия DRF"""
+
+    view_class = getattr(view_func, 'cls', None)
+    if view_class is None:
+        return f'{view_func.__module__}.{view_func.__name__}', None
+    return view_class.__name__, getattr(view_func, 'actions', None)
+
+
+class ServerTimingMiddleware:
+    """Middleware для замера времени обработки запросов.
+
+    Для доли запросов, заданной REQUEST_TIMING['SAMPLE_RATE'],
+    считает SQL-запросы и время в базе, время обработчика
+    представления, время сериализации ответа рендерером и общее
+    время, добавляет заголовок Server-Timing и пишет строку JSON в лог
+    api.timing. Запросы, повторенные не меньше DUPLICATE_THRESHOLD раз
+    (признак N+1), попадают в лог вместе с местом вызова. Остальные
+    запросы проходят без замеров. Для потоковых ответов заголовок
+    содержит замеры до начала отдачи, а строка лога пишется после
+    нее и учитывает запросы, выполненные при чтении потока.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.options = {
+            **DEFAULTS, **getattr(settings, 'REQUEST_TIMING', {})
+        }
+
+    def __call__(self, request):
+        if (not self.options['ENABLED']
+                or random.random() >= self.options['SAMPLE_RATE']):
+            return self.get_response(request)
+        timing = RequestTiming(self.options['DUPLICATE_THRESHOLD'])
+        request.timing = timing
+        started = time.perf_counter()
+        with connection.execute_wrapper(timing):
+            response = self.get_response(request)
+        total = time.perf_counter() - started
+        response['Server-Timing'] = self.header(timing, total)
+        if response.streaming:
+            wrap_streaming(response, timing, lambda size: self.log(
+                request, response, timing, time.perf_counter() - started
+            ))
+        else:
+            self.log(request, response, timing, total)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if hasattr(request, 'timing'):
+            request.timing.view = view_name(view_func)
+
+    def header(self, timing, total):
+        return ', '.join((
+            f'db;dur={timing.db_time * 1000:.1f};'
+            f'desc="{timing.queries} queries"',
+            f'view;dur={timing.view_time * 1000:.1f}',
+            f'serializer;dur={timing.serializer_time * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}',
+        ))
+
+    def log(self, request, response, timing, total):
+        view, actions = timing.view
+        duplicates = timing.duplicates()
+        total_ms = round(total * 1000, 1)
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'view': view,
+            'action': (actions or {}).get(request.method.lower()),
+            'queries': timing.queries,
+            'db_ms': round(timing.db_time * 1000, 1),
+            'view_ms': round(timing.view_time * 1000, 1),
+            'serializer_ms': round(timing.serializer_time * 1000, 1),
+            'total_ms': total_ms,
+        }
+        if duplicates:
+            record['duplicates'] = duplicates
+        level = (
+            logging.WARNING
+            if duplicates or total_ms >= self.options['SLOW_MS']
+            else logging.INFO
+        )
+        logger.log(level, json.dumps(record, ensure_ascii=False))
+
+
+def count_queries(counter):
+    """Функция-обертка для execute_wrapper, считающая SQL-запросы"""
+
+    def wrapper(execute, sql, params, many, context):
+        counter[0] += 1
+        return execute(sql, params, many, context)
+
+    return wrapper
+
+
+class MetricsMiddleware:
+    """Middleware для сбора метрик Prometheus по каждому запросу.
+
+    Записывает время ответа, число SQL-запросов и размер тела с
+    метками представления DRF, действия, метода и статуса. Запросы
+    вне представлений DRF получают метку view="other", чтобы число
+    рядов не росло с числом адресов. Потоковые ответы учитываются
+    после отдачи всего тела.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.metrics_view = ('other', '')
+        queries = [0]
+        started = time.perf_counter()
+        wrapper = count_queries(queries)
+        with connection.execute_wrapper(wrapper):
+            response = self.get_response(request)
+        labels = (*request.metrics_view, request.method, response.status_code)
+
+        def observe(size):
+            metrics.observe_request(
+                labels, time.perf_counter() - started, queries[0], size
+            )
+
+        if response.streaming:
+            wrap_streaming(response, wrapper, observe)
+        else:
+            observe(len(response.content))
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view, actions = view_name(view_func)
+        if actions is not None:
+            request.metrics_view = (
+                view, actions.get(request.method.lower(), '')
+            )
@@ -0,0 +1,165 @@
+import time
+from hashlib import md5
+
+from django.core.cache import cache
+from django.db import connection
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from foodgram import metrics
+from recipes import catalog, counters
+from rest_framework import serializers
+
+
+class CatalogCacheMixin:
+    """Миксин для кэширования списков справочников.
+
+    Ответ получает ETag и Last-Modified по версии справочников,
+    повторный запрос с теми же валидаторами получает 304. Готовое
+    тело ответа хранится в кэше до смены версии, поэтому повторные
+    запросы не обращаются к ORM и сериализатору.
+    """
+
+    def list(self, request, *args, **kwargs):
+        version = catalog.get_version()
+        renderer = request.accepted_renderer
+        path_hash = md5(request.get_full_path().encode()).hexdigest()
+        tag = f'{version["version"]}-{renderer.format}-{path_hash}'
+        etag = f'"{tag}"'
+        response = get_conditional_response(
+            request, etag=etag, last_modified=version['modified']
+        )
+        if response is None:
+            if renderer.format != 'json':
+                return super().list(request, *args, **kwargs)
+            cache_key = f'catalog:{tag}'
+            body = cache.get(cache_key)
+            metrics.cache_result('catalog_response', body is not None)
+            if body is None:
+                data = super().list(request, *args, **kwargs).data
+                body = renderer.render(
+                    data, request.accepted_media_type,
+                    self.get_renderer_context()
+                )
+                cache.set(cache_key, body)
+            response = HttpResponse(body, content_type=renderer.media_type)
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(version['modified'])
+        patch_cache_control(response, public=True, no_cache=True)
+        return response
+
+
+BATCH_LIMIT = 100
+
+
+class TimingMixin:
+    """Миксин для замера времени обработчика представления.
+
+    Для запросов из выборки ServerTimingMiddleware время от конца
+    проверки прав до готового ответа, включая to_representation
+    сериализаторов, добавляется к request.timing.view_time.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.view_started = time.perf_counter()
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        timing = getattr(request, 'timing', None)
+        started = getattr(self, 'view_started', None)
+        if timing is not None and started is not None:
+            timing.view_time += time.perf_counter() - started
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class BatchSerializer(serializers.Serializer):
+    """Сериализатор для списка id в пакетных запросах"""
+
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=BATCH_LIMIT,
+    )
+
+
+def insert_links(model, user_id, field, ids):
+    """Функция для вставки связей пользователя с объектами ids.
+
+    INSERT ... ON CONFLICT DO NOTHING RETURNING возвращает только
+    действительно вставленные строки, поэтому параллельный запрос с
+    теми же id не будет учтен дважды. Возвращает множество id.
+    """
+
+    if not ids:
+        return set()
+    quote = connection.ops.quote_name
+    meta = model._meta
+    column = quote(meta.get_field(field).column)
+    values = ', '.join(['(%s, %s)'] * len(ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {quote(meta.db_table)} '
+            f'({quote(meta.get_field("user").column)}, {column}) '
+            f'VALUES {values} ON CONFLICT DO NOTHING RETURNING {column}',
+            [value for pk in ids for value in (user_id, pk)],
+        )
+        return {row[0] for row in cursor.fetchall()}
+
+
+class BatchLinkMixin:
+    """Миксин для пакетного добавления и удаления связей пользователя.
+
+    Связи (избранное, корзина, подписки) добавляются одним INSERT с
+    пропуском существующих и удаляются одним запросом, для каждого id
+    возвращается результат.
+    """
+
+    def get_batch_ids(self, request):
+        serializer = BatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return list(dict.fromkeys(serializer.validated_data['ids']))
+
+    def add_links(self, model, field, ids, targets, rejected=None):
+        """Метод для добавления связей с объектами из targets.
+
+        rejected - словарь {id: статус} для id, которые нельзя
+        добавить. Возвращает множество добавленных id и результаты.
+        """
+
+        rejected = rejected or {}
+        user = self.request.user
+        targets = set(targets) - rejected.keys()
+        added = insert_links(model, user.id, field, sorted(targets))
+        counters.links_changed(model, user.id, added, 1)
+        results = []
+        for pk in ids:
+            if pk in rejected:
+                result = rejected[pk]
+            elif pk in added:
+                result = 'added'
+            elif pk in targets:
+                result = 'exists'
+            else:
+                result = 'not_found'
+            results.append({'id': pk, 'status': result})
+        return added, results
+
+    def remove_links(self, model, field, ids):
+        """Метод для удаления связей. Возвращает удаленные id и результаты.
+
+        Строки блокируются перед удалением, поэтому параллельный запрос
+        не посчитает их удаленными второй раз.
+        """
+
+        user = self.request.user
+        removed = set(model.objects.select_for_update().filter(
+            user=user, **{f'{field}__in': ids}
+        ).values_list(field, flat=True))
+        if removed:
+            model.objects.filter(
+                user=user, **{f'{field}__in': removed}
+            ).delete()
+        return removed, [
+            {'id': pk, 'status': 'removed' if pk in removed else 'absent'}
+            for pk in ids
+        ]
@@ -1,4 +1,20 @@
-from rest_framework.pagination import PageNumberPagination
+from base64 import b64decode, b64encode
+from binascii import Error as BinasciiError
+from collections import OrderedDict
+from functools import partial
+from hashlib import md5
+
+from django.core.cache import cache, caches
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+from foodgram.counts import count_generation_key, estimate_count
+from foodgram.metrics import cache_result
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 
 class MyPagination(PageNumberPagination):
@@ -6,3 +22,159 @@ class MyPagination(PageNumberPagination):
 
     page_size_query_param = 'limit'
     page_size = 6
+
+
+COUNT_CACHE_TTL = 60
+
+
+class CachedCountPaginator(Paginator):
+    """Пагинатор Django, берущий количество объектов из кэша"""
+
+    def __init__(self, *args, count_key, estimate_table=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.count_key = count_key
+        self.estimate_table = estimate_table
+
+    @cached_property
+    def count(self):
+        count = cache.get(self.count_key)
+        cache_result('page_count', count is not None)
+        if count is None:
+            if self.estimate_table is not None:
+                count = estimate_count(self.estimate_table)
+            if count is None:
+                count = super().count
+            cache.set(self.count_key, count, COUNT_CACHE_TTL)
+        return count
+
+
+class CachedCountPagination(MyPagination):
+    """Пагинатор с кэшированием количества объектов.
+
+    Количество хранится COUNT_CACHE_TTL секунд для пары (эндпоинт,
+    набор фильтров) и сбрасывается при записи в связанные таблицы
+    через счетчик поколений пространства имен view.basename. Для
+    списка рецептов без фильтров на PostgreSQL используется оценка
+    из статистики планировщика, если таблица достаточно большая.
+    """
+
+    ignored_query_params = ('page', 'limit', 'recipes_limit', 'format')
+    user_query_params = ('is_favorited', 'is_in_shopping_cart')
+    user_actions = ('subscriptions',)
+    estimated_basenames = ('recipes',)
+
+    def get_filter_params(self, request):
+        return sorted(
+            (key, sorted(values))
+            for key, values in request.query_params.lists()
+            if key not in self.ignored_query_params
+        )
+
+    def get_count_key(self, params, queryset, request, view):
+        namespace = view.basename
+        generation = caches['versions'].get(
+            count_generation_key(namespace), 0
+        )
+        user_id = None
+        if (view.action in self.user_actions
+                or any(key in self.user_query_params for key, _ in params)):
+            user_id = request.user.id
+        filters = md5(repr((params, user_id)).encode()).hexdigest()
+        return (f'count:{namespace}:{generation}:{view.action}:'
+                f'{queryset.model._meta.label_lower}:{filters}')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = self.get_filter_params(request)
+        self.count_key = self.get_count_key(params, queryset, request, view)
+        self.estimate_table = None
+        if (not params and view.action == 'list'
+                and view.basename in self.estimated_basenames):
+            self.estimate_table = queryset.model._meta.db_table
+        return super().paginate_queryset(queryset, request, view)
+
+    @property
+    def django_paginator_class(self):
+        return partial(
+            CachedCountPaginator,
+            count_key=self.count_key,
+            estimate_table=self.estimate_table,
+        )
+
+
+class RecipeCursorPagination(BasePagination):
+    """Пагинатор по ключу (created, id) для бесконечной ленты рецептов.
+
+    Следующая страница выбирается условием по последнему рецепту
+    предыдущей, а не через OFFSET, и без подсчета COUNT(*), поэтому
+    время ответа не зависит от глубины страницы. Включается
+    параметром cursor, первая страница запрашивается с пустым cursor.
+    """
+
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'limit'
+    page_size = 6
+    max_page_size = 100
+    invalid_cursor_message = 'Неверный курсор'
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(page_size, 1), self.max_page_size)
+
+    def encode_cursor(self, recipe):
+        position = f'{recipe.created.isoformat()}|{recipe.id}'
+        return b64encode(position.encode(), altchars=b'-_').decode()
+
+    def decode_cursor(self, cursor):
+        try:
+            created, pk = b64decode(
+                cursor.encode(), altchars=b'-_', validate=True
+            ).decode().split('|')
+            created = parse_datetime(created)
+            pk = int(pk)
+        except (BinasciiError, UnicodeDecodeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if created is None:
+            raise NotFound(self.invalid_cursor_message)
+        return created, pk
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        queryset = queryset.order_by('-created', '-id')
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            created, pk = self.decode_cursor(cursor)
+            queryset = queryset.filter(
+                Q(created__lt=created) | Q(created=created, id__lt=pk)
+            )
+        page = list(queryset[:page_size + 1])
+        self.has_next = len(page) > page_size
+        self.page = page[:page_size]
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.encode_cursor(self.page[-1]),
+        )
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
@@ -0,0 +1,142 @@
+import csv
+import json
+import time
+from abc import ABC, abstractmethod
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+
+class Echo:
+    """Буфер-заглушка для csv.writer, возвращающий записанную строку"""
+
+    def write(self, value):
+        return value
+
+
+class TimedRendererMixin:
+    """Миксин для замера времени сериализации ответа рендерером.
+
+    Для запросов из выборки ServerTimingMiddleware время render
+    добавляется к request.timing.serializer_time.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        started = time.perf_counter()
+        try:
+            return super().render(data, accepted_media_type, renderer_context)
+        finally:
+            request = (renderer_context or {}).get('request')
+            timing = getattr(request, 'timing', None)
+            if timing is not None:
+                timing.serializer_time += time.perf_counter() - started
+
+
+class TimedJSONRenderer(TimedRendererMixin, JSONRenderer):
+    """JSON-рендерер с замером времени сериализации"""
+
+
+def error_rows(data):
+    """Функция для перевода ответа с ошибкой в пары (поле, сообщение)"""
+
+    if not isinstance(data, dict):
+        data = {'detail': data}
+    return [
+        (str(key), '; '.join(map(str, value))
+         if isinstance(value, (list, tuple)) else str(value))
+        for key, value in data.items()
+    ]
+
+
+class ShoppingListRenderer(BaseRenderer, ABC):
+    """Базовый рендерер для потоковой выгрузки списка покупок.
+
+    Строки списка приходят из итератора по агрегированным ингредиентам
+    и отдаются клиенту по одной, не собираясь в памяти целиком.
+    Ошибки, возникшие до начала выгрузки, выводятся через render в
+    том же формате, что и список.
+    """
+
+    charset = 'utf-8'
+    extension = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """Метод для вывода ошибок, возникших до начала выгрузки"""
+
+        return ''.join(self.render_errors(error_rows(data))).encode(
+            self.charset
+        )
+
+    @abstractmethod
+    def render_errors(self, errors):
+        """Метод, формирующий ответ с ошибками по парам (поле, сообщение)"""
+
+    @abstractmethod
+    def stream(self, ingredients):
+        """Метод, построчно формирующий файл со списком покупок"""
+
+
+class TxtShoppingListRenderer(ShoppingListRenderer):
+    """Список покупок в текстовом формате"""
+
+    media_type = 'text/plain'
+    format = 'txt'
+    extension = 'txt'
+
+    def render_errors(self, errors):
+        for field, message in errors:
+            yield f'{field}: {message}\n'
+
+    def stream(self, ingredients):
+        for ingredient in ingredients:
+            yield (
+                f"{ingredient['ingredient__name']}  - "
+                f"{ingredient['sum']}"
+                f"({ingredient['ingredient__measurement_unit']})\n"
+            )
+
+
+class CsvShoppingListRenderer(ShoppingListRenderer):
+    """Список покупок в формате CSV"""
+
+    media_type = 'text/csv'
+    format = 'csv'
+    extension = 'csv'
+
+    def render_errors(self, errors):
+        writer = csv.writer(Echo())
+        yield writer.writerow(('field', 'error'))
+        for row in errors:
+            yield writer.writerow(row)
+
+    def stream(self, ingredients):
+        writer = csv.writer(Echo())
+        yield writer.writerow(('name', 'measurement_unit', 'amount'))
+        for ingredient in ingredients:
+            yield writer.writerow((
+                ingredient['ingredient__name'],
+                ingredient['ingredient__measurement_unit'],
+                ingredient['sum'],
+            ))
+
+
+class JsonShoppingListRenderer(ShoppingListRenderer):
+    """Список покупок в формате JSON"""
+
+    media_type = 'application/json'
+    format = 'json'
+    extension = 'json'
+
+    def render_errors(self, errors):
+        yield json.dumps(dict(errors), ensure_ascii=False)
+
+    def stream(self, ingredients):
+        separator = ''
+        yield '['
+        for ingredient in ingredients:
+            yield separator + json.dumps({
+                'name': ingredient['ingredient__name'],
+                'measurement_unit': ingredient['ingredient__measurement_unit'],
+                'amount': ingredient['sum'],
+            }, ensure_ascii=False)
+            separator = ','
+        yield ']'
@@ -1,12 +1,18 @@
-from api.validators import image_validator
+import os
+
+from api.validators import image_header_validator, image_validator
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from djoser.serializers import UserCreateSerializer
 from drf_extra_fields.fields import Base64ImageField
+from recipes import recipe_index, shopping_list, similarity
+from recipes.images import srcset
 from recipes.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
                             ShoppingCart, Tag, TagRecipe)
 from rest_framework import serializers
-from rest_framework.serializers import (IntegerField, ModelSerializer,
-                                        PrimaryKeyRelatedField, ReadOnlyField,
-                                        SerializerMethodField)
+from rest_framework.serializers import (FileField, FloatField, IntegerField,
+                                        ListField, ModelSerializer,
+                                        ReadOnlyField, SerializerMethodField)
 from rest_framework.validators import UniqueTogetherValidator
 from users.models import CustomUser, Follow
 
@@ -28,6 +34,8 @@ class CustomUserSerializer(UserCreateSerializer):
     def get_is_subscribed(self, obj):
         """Метод для проверки подписки на пользователей"""
 
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         user = self.context.get('request').user
         if user.is_anonymous:
             return False
@@ -48,6 +56,46 @@ class CustomCreateUserSerializer(CustomUserSerializer):
 #                          Рецепты, теги и ингридиенты
 # -----------------------------------------------------------------------
 
+class ImageSrcsetField(serializers.Field):
+    """Поле для вывода уменьшенных копий фото рецепта.
+
+    Отдает словарь {формат: строка srcset}, который клиент подставляет
+    в <source srcset>, или None, если копии еще не созданы.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('source', 'image_renditions')
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        request = self.context.get('request')
+        storage = Recipe._meta.get_field('image').storage
+
+        def build_url(name):
+            url = storage.url(name)
+            return request.build_absolute_uri(url) if request else url
+
+        return srcset(value, build_url)
+
+
+class RecipeImageField(Base64ImageField):
+    """Поле для фото рецепта: строка base64 в JSON или файл в multipart.
+
+    Файл из multipart уже записан Django во временный файл и не
+    декодируется целиком: формат и размеры проверяет
+    image_header_validator по заголовку.
+    """
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or data in self.EMPTY_VALUES:
+            return super().to_internal_value(data)
+        image = FileField.to_internal_value(self, data)
+        _, extension = os.path.splitext(image.name)
+        image.name = f'{self.get_file_name(image)}{extension.lower()}'
+        return image
+
+
 class IngredientSerializer(ModelSerializer):
     """Сериализатор для ингредиентов"""
 
@@ -86,16 +134,19 @@ class RecipeSerializer(ModelSerializer):
     tags = TagSerializer(many=True)
     is_favorited = SerializerMethodField()
     is_in_shopping_cart = SerializerMethodField()
+    image_srcset = ImageSrcsetField()
 
     class Meta:
         model = Recipe
         fields = ('id', 'tags', 'author', 'ingredients',
                   'is_favorited', 'is_in_shopping_cart',
-                  'name', 'image', 'text', 'cooking_time')
+                  'name', 'image', 'image_srcset', 'text', 'cooking_time')
 
     def get_is_favorited(self, obj):
         "Метод, проверяющий подписку"
 
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         request = self.context.get('request')
         if request is None or request.user.is_anonymous:
             return False
@@ -104,6 +155,8 @@ class RecipeSerializer(ModelSerializer):
     def get_is_in_shopping_cart(self, obj):
         "Метод, проверяющий наличие рецепта в корзине"
 
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         request = self.context.get('request')
         if request is None or request.user.is_anonymous:
             return False
@@ -111,6 +164,16 @@ class RecipeSerializer(ModelSerializer):
                                            recipe=obj).exists()
 
 
+class PantryRecipeSerializer(RecipeSerializer):
+    """Сериализатор для рецептов, подобранных по ингредиентам"""
+
+    coverage = FloatField(read_only=True)
+    missing = IntegerField(read_only=True)
+
+    class Meta(RecipeSerializer.Meta):
+        fields = RecipeSerializer.Meta.fields + ('coverage', 'missing')
+
+
 class IngredientRecipeCreateSerializer(ModelSerializer):
     """Сериализатор для создания ингридиентов в рецептах"""
 
@@ -139,8 +202,10 @@ class CreateRecipeSerializer(ModelSerializer):
     """Сериализатор для создания рецепта"""
 
     ingredients = IngredientRecipeCreateSerializer(many=True)
-    tags = PrimaryKeyRelatedField(many=True, queryset=Tag.objects.all())
-    image = Base64ImageField(use_url=True, validators=[image_validator])
+    tags = ListField(child=IntegerField())
+    image = RecipeImageField(
+        use_url=True, validators=[image_validator, image_header_validator]
+    )
 
     class Meta:
 
@@ -148,36 +213,62 @@ class CreateRecipeSerializer(ModelSerializer):
         fields = ('ingredients', 'tags', 'image',
                   'name', 'text', 'cooking_time')
 
+    def validate_ingredients(self, value):
+        """Метод для проверки ингредиентов одним запросом к базе"""
+
+        ids = {ingredient['id'] for ingredient in value}
+        if len(ids) != len(value):
+            raise serializers.ValidationError(
+                'Ингридиенты не должны повторяться'
+            )
+        missing = ids - set(
+            Ingredient.objects.filter(id__in=ids).values_list('id', flat=True)
+        )
+        if missing:
+            raise serializers.ValidationError(
+                f'Ингредиенты не найдены: {sorted(missing)}'
+            )
+        return value
+
+    def validate_tags(self, value):
+        """Метод для проверки тегов одним запросом к базе"""
+
+        if len(set(value)) != len(value):
+            raise serializers.ValidationError('Теги не должны повторяться')
+        tags = Tag.objects.in_bulk(value)
+        missing = set(value) - tags.keys()
+        if missing:
+            raise serializers.ValidationError(
+                f'Теги не найдены: {sorted(missing)}'
+            )
+        return [tags[pk] for pk in value]
+
     def validate(self, data):
         """Метод для проверки рецепта"""
 
-        ingredients = self.initial_data.get('ingredients')
-        tags = self.initial_data.get('tags')
-        list_ingredients = []
-        list_tags = []
-
-        if not ingredients or not tags:
+        ingredients = data.get('ingredients')
+        tags = data.get('tags')
+        if self.partial:
+            empty = ingredients == [] or tags == []
+        else:
+            empty = not ingredients or not tags
+        if empty:
             raise serializers.ValidationError(
                 'Списки ингредиентов и тегов не должны быть пустыми'
             )
-        for ingredient in ingredients:
-            if ingredient['id'] in list_ingredients:
-                raise serializers.ValidationError(
-                    'Ингридиенты не должны повторяться'
-                )
-            list_ingredients.append(ingredient['id'])
-        for tag in tags:
-            if tag in list_tags:
-                raise serializers.ValidationError(
-                    'Теги не должны повторяться'
-                )
-            list_tags.append(tag)
-
         return data
 
     def to_representation(self, instance):
         """Метод для преобразования типа данных"""
 
+        prefetch_related_objects(
+            [instance],
+            'tags',
+            Prefetch(
+                'ingredient_recipe',
+                queryset=IngredientRecipe.objects.select_related('ingredient'),
+            ),
+        )
         serializer = RecipeSerializer(
             instance,
             context={'request': self.context.get('request')}
@@ -188,43 +279,123 @@ class CreateRecipeSerializer(ModelSerializer):
     def create_ingredients(self, ingredients, recipe):
         """Методы для создания ингридиента"""
 
-        objects = []
-        for ingr in ingredients:
-            objects.append(
-                IngredientRecipe(
-                    recipe=recipe,
-                    ingredient_id=ingr['id'],
-                    amount=ingr['amount']
-                )
+        IngredientRecipe.objects.bulk_create(
+            IngredientRecipe(
+                recipe=recipe,
+                ingredient_id=ingr['id'],
+                amount=ingr['amount']
             )
-        IngredientRecipe.objects.bulk_create(objects)
+            for ingr in ingredients
+        )
 
     def create_tags(self, tags, recipe):
         """Метод для добавления тега"""
 
-        recipe.tags.set(tags)
+        TagRecipe.objects.bulk_create(
+            TagRecipe(recipe=recipe, tag=tag) for tag in tags
+        )
 
     def create(self, validated_data):
-        """Метод для создания модели"""
+        """Метод для создания модели.
+
+        Рецепт, его ингредиенты и теги записываются в одной транзакции
+        через bulk_create, поэтому число запросов не зависит от длины
+        списков.
+        """
 
         ingredients = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
         user = self.context.get('request').user
-        recipe = Recipe.objects.create(**validated_data, author=user)
-        self.create_ingredients(ingredients, recipe)
-        self.create_tags(tags, recipe)
+        with transaction.atomic():
+            recipe = Recipe.objects.create(**validated_data, author=user)
+            self.create_ingredients(ingredients, recipe)
+            self.create_tags(tags, recipe)
+            recipe_index.update_index(
+                recipe.id, added=[ingr['id'] for ingr in ingredients]
+            )
+            similarity.index_recipe(
+                recipe.id,
+                [ingr['id'] for ingr in ingredients],
+                [tag.id for tag in tags],
+            )
 
         return recipe
 
-    def update(self, instance, validated_data):
-        """Метод обновления модели"""
+    def update_ingredients(self, instance, ingredients):
+        """Метод для изменения только отличающихся ингредиентов рецепта"""
+
+        current = {
+            row.ingredient_id: row
+            for row in IngredientRecipe.objects.filter(recipe=instance)
+        }
+        old_amounts = {pk: row.amount for pk, row in current.items()}
+        new_amounts = {ingr['id']: ingr['amount'] for ingr in ingredients}
+        removed = old_amounts.keys() - new_amounts.keys()
+        added = new_amounts.keys() - old_amounts.keys()
+        changed = []
+        for pk in old_amounts.keys() & new_amounts.keys():
+            if old_amounts[pk] != new_amounts[pk]:
+                current[pk].amount = new_amounts[pk]
+                changed.append(current[pk])
+        if removed:
+            IngredientRecipe.objects.filter(
+                id__in=[current[pk].id for pk in removed]
+            ).delete()
+        IngredientRecipe.objects.bulk_update(changed, ('amount',))
+        self.create_ingredients(
+            [ingr for ingr in ingredients if ingr['id'] in added], instance
+        )
+        shopping_list.change_recipe(instance.id, old_amounts, new_amounts)
+        recipe_index.update_index(instance.id, added=added, removed=removed)
+        return new_amounts.keys()
 
-        IngredientRecipe.objects.filter(recipe=instance).delete()
-        TagRecipe.objects.filter(recipe=instance).delete()
-        self.create_ingredients(validated_data.pop('ingredients'), instance)
-        self.create_tags(validated_data.pop('tags'), instance)
+    def update_tags(self, instance, tags):
+        """Метод для изменения только отличающихся тегов рецепта"""
 
-        return super().update(instance, validated_data)
+        old_ids = set(
+            TagRecipe.objects.filter(recipe=instance).values_list(
+                'tag_id', flat=True
+            )
+        )
+        new_ids = {tag.id for tag in tags}
+        if old_ids - new_ids:
+            TagRecipe.objects.filter(
+                recipe=instance, tag_id__in=old_ids - new_ids
+            ).delete()
+        self.create_tags(
+            [tag for tag in tags if tag.id not in old_ids], instance
+        )
+        return new_ids
+
+    def update(self, instance, validated_data):
+        """Метод обновления модели.
+
+        Связи с ингредиентами и тегами меняются по разнице с текущими:
+        удаляются, добавляются и обновляются только отличающиеся
+        строки. Если в частичном обновлении ингредиентов или тегов
+        нет, их связи не трогаются.
+        """
+
+        ingredients = validated_data.pop('ingredients', None)
+        tags = validated_data.pop('tags', None)
+        with transaction.atomic():
+            ingredient_ids = tag_ids = None
+            if ingredients is not None:
+                ingredient_ids = self.update_ingredients(instance, ingredients)
+            if tags is not None:
+                tag_ids = self.update_tags(instance, tags)
+            if ingredient_ids is not None or tag_ids is not None:
+                if ingredient_ids is None:
+                    ingredient_ids = IngredientRecipe.objects.filter(
+                        recipe=instance
+                    ).values_list('ingredient_id', flat=True)
+                if tag_ids is None:
+                    tag_ids = TagRecipe.objects.filter(
+                        recipe=instance
+                    ).values_list('tag_id', flat=True)
+                similarity.index_recipe(instance.id, ingredient_ids, tag_ids)
+
+            return super().update(instance, validated_data)
 
 # ---------------------------------------------------------------------------
 #                                  Подписки и избранное
@@ -257,9 +428,20 @@ class FirstFollowSerializer(serializers.ModelSerializer):
 class ForFollowRecipeSerializer(ModelSerializer):
     """Сериализатор для рецептов для FollowSerializer"""
 
+    image_srcset = ImageSrcsetField()
+
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_srcset', 'cooking_time')
+
+
+class SimilarRecipeSerializer(ForFollowRecipeSerializer):
+    """Сериализатор для похожих рецептов"""
+
+    similarity = FloatField(read_only=True)
+
+    class Meta(ForFollowRecipeSerializer.Meta):
+        fields = ForFollowRecipeSerializer.Meta.fields + ('similarity',)
 
 
 class FollowSerializer(CustomUserSerializer):
@@ -276,6 +458,9 @@ class FollowSerializer(CustomUserSerializer):
     def get_recipes(self, obj):
         """Метод для получения рецептов"""
 
+        if hasattr(obj, 'limited_recipes'):
+            return ForFollowRecipeSerializer(obj.limited_recipes,
+                                             many=True).data
         request = self.context.get('request')
         recipes = obj.recipes.all()
         recipes_limit = request.query_params.get('recipes_limit')
@@ -283,7 +468,9 @@ class FollowSerializer(CustomUserSerializer):
             try:
                 recipes_limit = int(recipes_limit)
             except ValueError:
-                raise ValueError('recipes_limit должен быть числом')
+                raise serializers.ValidationError(
+                    {'recipes_limit': 'recipes_limit должен быть числом'}
+                )
             recipes = recipes[:recipes_limit]
         return ForFollowRecipeSerializer(recipes, many=True).data
 
@@ -291,13 +478,14 @@ class FollowSerializer(CustomUserSerializer):
     def get_recipes_count(obj):
         """Метод для получения количества рецептов"""
 
-        return obj.recipes.count()
+        return obj.recipes_count
 
 
 class FavoritSerializer(serializers.ModelSerializer):
     """Сериализатор для добавления рецептов в избранное"""
     image = Base64ImageField()
+    image_srcset = ImageSrcsetField()
 
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_srcset', 'cooking_time')
@@ -0,0 +1,27 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from foodgram.counts import bump_count_generation
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import CustomUser, Follow
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+@receiver((post_save, post_delete), sender=Favorite)
+@receiver((post_save, post_delete), sender=ShoppingCart)
+def recipes_changed(**kwargs):
+    """Сбрасываем кэшированные количества рецептов"""
+
+    bump_count_generation('recipes')
+
+
+@receiver((post_save, post_delete), sender=CustomUser)
+@receiver((post_save, post_delete), sender=Follow)
+def users_changed(update_fields=None, **kwargs):
+    """Сбрасываем кэшированные количества пользователей и подписок.
+
+    Вход пользователя меняет только last_login и на количества не влияет.
+    """
+
+    if update_fields == {'last_login'}:
+        return
+    bump_count_generation('users')
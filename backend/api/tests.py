@@ -0,0 +1,199 @@
+import json
+
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from foodgram.counts import count_generation_key
+from recipes.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
+                            ShoppingCart, ShoppingListItem)
+from rest_framework.test import APIClient
+from users.models import CustomUser
+
+
+class BatchLinkTest(TestCase):
+    """Тесты пакетного добавления рецептов в избранное и корзину"""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            email='user@example.com', username='user',
+            first_name='Имя', last_name='Фамилия', password='password',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        salt = Ingredient.objects.create(name='Соль', measurement_unit='г')
+        self.recipes = [
+            Recipe.objects.create(
+                author=self.user, name=f'Рецепт {number}', text='Описание',
+                cooking_time=10,
+            )
+            for number in range(2)
+        ]
+        for recipe in self.recipes:
+            IngredientRecipe.objects.create(
+                recipe=recipe, ingredient=salt, amount=5
+            )
+        self.ids = [recipe.pk for recipe in self.recipes]
+
+    def post(self, name, ids):
+        response = self.client.post(
+            reverse(f'api:recipes-{name}-batch'), {'ids': ids}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        return [row['status'] for row in response.data['results']]
+
+    def counts(self, field):
+        return list(
+            Recipe.objects.filter(id__in=self.ids).order_by('id').values_list(
+                field, flat=True
+            )
+        )
+
+    def test_same_ids_twice(self):
+        self.assertEqual(
+            self.post('shopping_cart', self.ids), ['added', 'added']
+        )
+        self.assertEqual(
+            self.post('shopping_cart', self.ids + [999999]),
+            ['exists', 'exists', 'not_found'],
+        )
+        self.assertEqual(self.counts('carts_count'), [1, 1])
+        self.assertEqual(
+            list(ShoppingListItem.objects.values_list(
+                'total_amount', flat=True
+            )),
+            [10],
+        )
+
+    def test_row_inserted_by_another_request(self):
+        Favorite.objects.bulk_create(
+            (Favorite(user=self.user, recipe=self.recipes[0]),)
+        )
+        self.assertEqual(self.post('favorite', self.ids), ['exists', 'added'])
+        self.assertEqual(self.counts('favorites_count'), [0, 1])
+
+    def test_remove_twice(self):
+        self.post('shopping_cart', self.ids)
+        response = self.client.delete(
+            reverse('api:recipes-shopping_cart-batch'),
+            {'ids': self.ids}, format='json',
+        )
+        self.assertEqual(
+            [row['status'] for row in response.data['results']],
+            ['removed', 'removed'],
+        )
+        response = self.client.delete(
+            reverse('api:recipes-shopping_cart-batch'),
+            {'ids': self.ids}, format='json',
+        )
+        self.assertEqual(
+            [row['status'] for row in response.data['results']],
+            ['absent', 'absent'],
+        )
+        self.assertEqual(self.counts('carts_count'), [0, 0])
+        self.assertFalse(ShoppingCart.objects.exists())
+        self.assertFalse(ShoppingListItem.objects.exists())
+
+
+class DownloadShoppingCartTest(TestCase):
+    """Тесты потоковой выгрузки списка покупок"""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            email='user@example.com', username='user',
+            first_name='Имя', last_name='Фамилия', password='password',
+        )
+        salt = Ingredient.objects.create(name='Соль', measurement_unit='г')
+        ShoppingListItem.objects.create(
+            user=self.user, ingredient=salt, total_amount=15
+        )
+        self.url = reverse('api:recipes-download_shopping_cart')
+
+    def download(self, file_format, user=None):
+        client = APIClient()
+        if user is not None:
+            client.force_authenticate(user)
+        return client.get(self.url, {'format': file_format})
+
+    def test_formats(self):
+        expected = {
+            'txt': ('text/plain', 'Соль  - 15(г)\n'),
+            'csv': ('text/csv', 'name,measurement_unit,amount\r\n'
+                                'Соль,г,15\r\n'),
+            'json': ('application/json', json.dumps([{
+                'name': 'Соль', 'measurement_unit': 'г', 'amount': 15,
+            }], ensure_ascii=False)),
+        }
+        for file_format, (media_type, body) in expected.items():
+            with self.subTest(file_format):
+                response = self.download(file_format, self.user)
+                self.assertEqual(response.status_code, 200)
+                self.assertTrue(response['Content-Type'].startswith(
+                    media_type
+                ))
+                self.assertIn(
+                    f'shopping_list.{file_format}',
+                    response['Content-Disposition'],
+                )
+                self.assertEqual(
+                    b''.join(response.streaming_content).decode(), body
+                )
+
+    def test_errors_use_requested_format(self):
+        response = self.download('csv')
+        self.assertEqual(response.status_code, 401)
+        self.assertTrue(response['Content-Type'].startswith('text/csv'))
+        self.assertTrue(response.content.decode().startswith(
+            'field,error\r\ndetail,'
+        ))
+        response = self.download('txt')
+        self.assertTrue(response.content.decode().startswith('detail: '))
+
+    @override_settings(REQUEST_TIMING={'ENABLED': True, 'SAMPLE_RATE': 1.0})
+    def test_streamed_queries_are_timed(self):
+        with self.assertLogs('api.timing', 'INFO') as logs:
+            response = self.download('csv', self.user)
+            self.assertEqual(logs.output, [])
+            b''.join(response.streaming_content)
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['action'], 'download_shopping_cart')
+        self.assertGreaterEqual(record['queries'], 1)
+
+
+@override_settings(REQUEST_TIMING={'ENABLED': True, 'SAMPLE_RATE': 1.0})
+class RequestTimingTest(TestCase):
+    """Тесты замеров запросов без подмены сериализаторов"""
+
+    def test_view_and_renderer_are_timed(self):
+        Ingredient.objects.create(name='Соль', measurement_unit='г')
+        with self.assertLogs('api.timing', 'INFO') as logs:
+            response = APIClient().get(reverse('api:ingredients-list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('view;dur=', response['Server-Timing'])
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['view'], 'IngredientViewSet')
+        self.assertEqual(record['action'], 'list')
+        self.assertGreater(record['total_ms'], 0)
+        self.assertIn('view_ms', record)
+        self.assertIn('serializer_ms', record)
+
+
+class CountGenerationTest(TestCase):
+    """Тесты сброса кэшированных количеств"""
+
+    def generation(self, namespace):
+        return caches['versions'].get(count_generation_key(namespace), 0)
+
+    def test_bumped_after_commit(self):
+        before = self.generation('users')
+        with self.captureOnCommitCallbacks(execute=True):
+            user = CustomUser.objects.create_user(
+                email='user@example.com', username='user',
+                first_name='Имя', last_name='Фамилия', password='password',
+            )
+            self.assertEqual(self.generation('users'), before)
+        self.assertEqual(self.generation('users'), before + 1)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.client.force_login(user)
+            user.save(update_fields=('last_login',))
+        self.assertEqual(callbacks, [])
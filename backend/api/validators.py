@@ -1,6 +1,9 @@
+from PIL import Image, UnidentifiedImageError
 from rest_framework.exceptions import ValidationError
 
 MEGABYTE_LIMIT = 5
+MAX_IMAGE_SIDE = 6000
+IMAGE_FORMATS = ('JPEG', 'PNG', 'GIF', 'WEBP')
 
 
 def image_validator(image):
@@ -9,3 +12,28 @@ def image_validator(image):
 
     if filesize > MEGABYTE_LIMIT * 1024 * 1024:
         raise ValidationError(f"Максимальный размер фала - {MEGABYTE_LIMIT}MB")
+
+
+def image_header_validator(image):
+    """Функция для проверки формата и размеров фото по заголовку файла.
+
+    Pillow читает только заголовок, пиксели не декодируются, поэтому
+    проверка не зависит от размера файла по памяти.
+    """
+
+    try:
+        image.seek(0)
+        with Image.open(image) as picture:
+            image_format, (width, height) = picture.format, picture.size
+    except (OSError, UnidentifiedImageError, Image.DecompressionBombError):
+        raise ValidationError('Загрузите корректное изображение')
+    finally:
+        image.seek(0)
+    if image_format not in IMAGE_FORMATS:
+        raise ValidationError(
+            f'Допустимые форматы: {", ".join(IMAGE_FORMATS)}'
+        )
+    if max(width, height) > MAX_IMAGE_SIDE:
+        raise ValidationError(
+            f'Размер фото не должен превышать {MAX_IMAGE_SIDE} пикселей'
+        )
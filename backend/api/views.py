@@ -1,45 +1,108 @@
-from django.db.models import Sum
-from django.http import HttpResponse
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, Prefetch, Value
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
+from foodgram.counts import bump_count_generation
+from jobs.queue import enqueue
+from recipes import ingredient_index, recipe_index, shopping_list, similarity
 from recipes.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
-                            ShoppingCart, Tag)
+                            ShoppingCart, ShoppingListItem, Tag)
+from recipes.tasks import delete_recipe
 from rest_framework import status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import (AllowAny, IsAuthenticated,
                                         IsAuthenticatedOrReadOnly)
 from rest_framework.response import Response
 from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
 from users.models import CustomUser, Follow
+from users.tasks import delete_user
 
 from .filters import IngredientFilter, RecipeFilter
-from .pagination import MyPagination
+from .mixins import BatchLinkMixin, CatalogCacheMixin, TimingMixin
+from .pagination import (CachedCountPagination, MyPagination,
+                         RecipeCursorPagination)
 from .permissions import IsAuthorOrReadOnly
+from .renderers import (CsvShoppingListRenderer, JsonShoppingListRenderer,
+                        TxtShoppingListRenderer)
 from .serializer import (CreateRecipeSerializer, CustomUserSerializer,
                          FavoritSerializer, FirstFollowSerializer,
                          FollowSerializer, IngredientSerializer,
-                         RecipeSerializer, TagSerializer)
+                         PantryRecipeSerializer, RecipeSerializer,
+                         SimilarRecipeSerializer, TagSerializer)
+
+INGREDIENT_SEARCH_LIMIT = 50
+SIMILAR_LIMIT = 6
+SIMILAR_MAX_LIMIT = 50
 
 # ---------------------------------------------------------------------------------
 #                                  Пользователи и подписки
 # ---------------------------------------------------------------------------------
 
 
-class CustomUserViewSet(UserViewSet):
+class CustomUserViewSet(TimingMixin, BatchLinkMixin, UserViewSet):
     """Вьюсет для работы с обьектами класса
     CustomUser и подписки на авторов."""
 
     queryset = CustomUser.objects.all()
     serializer_class = CustomUserSerializer
     permission_classes = (IsAuthenticatedOrReadOnly,)
-    pagination_class = MyPagination
+    pagination_class = CachedCountPagination
 
     def get_permissions(self):
         if self.action == "me":
             self.permission_classes = (IsAuthenticated,)
         return super().get_permissions()
 
+    def perform_destroy(self, instance):
+        """Метод, отключающий пользователя и удаляющий его в фоне"""
+
+        with transaction.atomic():
+            instance.is_active = False
+            instance.save(update_fields=('is_active',))
+            enqueue(delete_user, user_id=instance.id)
+
+    def get_recipes_limit(self):
+        """Метод для проверки параметра recipes_limit"""
+
+        recipes_limit = self.request.query_params.get('recipes_limit')
+        if recipes_limit is None:
+            return None
+        try:
+            recipes_limit = int(recipes_limit)
+        except ValueError:
+            raise ValidationError(
+                {'recipes_limit': 'recipes_limit должен быть числом'}
+            )
+        if recipes_limit < 0:
+            raise ValidationError(
+                {'recipes_limit': 'recipes_limit не может быть отрицательным'}
+            )
+        return recipes_limit
+
+    def get_follow_queryset(self, queryset):
+        """Метод для подготовки авторов к выводу в подписках.
+
+        Количество рецептов берется из счетчика автора, а последние
+        recipes_limit рецептов каждого автора подгружаются одним
+        запросом с оконной функцией.
+        """
+
+        recipes = Recipe.objects.only(
+            'id', 'name', 'image', 'image_renditions', 'cooking_time',
+            'author_id',
+        ).order_by('-created', '-id')
+        recipes_limit = self.get_recipes_limit()
+        if recipes_limit is not None:
+            recipes = recipes[:recipes_limit]
+        return queryset.annotate(
+            is_subscribed=Value(True),
+        ).prefetch_related(
+            Prefetch('recipes', queryset=recipes, to_attr='limited_recipes')
+        ).order_by('id')
+
     @action(
         detail=False,
         methods=('get',),
@@ -50,14 +113,16 @@ class CustomUserViewSet(UserViewSet):
     def subscriptions(self, request):
         """Метод для создания страницы подписок"""
 
-        queryset = CustomUser.objects.filter(follow__user=self.request.user)
-        if queryset:
-            pages = self.paginate_queryset(queryset)
-            serializer = FollowSerializer(pages, many=True,
-                                          context={'request': request})
-            return self.get_paginated_response(serializer.data)
-        return Response('Вы ни на кого не подписаны',
-                        status=status.HTTP_400_BAD_REQUEST)
+        queryset = self.get_follow_queryset(
+            CustomUser.objects.filter(follow__user=self.request.user)
+        )
+        pages = self.paginate_queryset(queryset)
+        if not self.paginator.page.paginator.count:
+            return Response('Вы ни на кого не подписаны',
+                            status=status.HTTP_400_BAD_REQUEST)
+        serializer = FollowSerializer(pages, many=True,
+                                      context={'request': request})
+        return self.get_paginated_response(serializer.data)
 
     @action(
         detail=True,
@@ -71,27 +136,61 @@ class CustomUserViewSet(UserViewSet):
 
         author = get_object_or_404(CustomUser, id=id)
         if request.method == 'POST':
+            author_queryset = self.get_follow_queryset(
+                CustomUser.objects.filter(id=author.id)
+            )
             serializer = FirstFollowSerializer(
                 data={'user': request.user.id, 'author': author.id}
             )
             serializer.is_valid(raise_exception=True)
-            serializer.save()
+            with transaction.atomic():
+                serializer.save()
             author_serializer = FollowSerializer(
-                author, context={'request': request}
+                author_queryset.get(), context={'request': request}
             )
             return Response(
                 author_serializer.data, status=status.HTTP_201_CREATED
             )
-        Follow.objects.filter(user=request.user, author=author).delete()
+        with transaction.atomic():
+            Follow.objects.filter(user=request.user, author=author).delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    @action(
+        detail=False,
+        methods=('post', 'delete'),
+        permission_classes=(IsAuthenticated,),
+        url_path='subscribe',
+        url_name='subscribe-batch',
+    )
+    def subscribe_batch(self, request):
+        """Метод для подписки и отписки от нескольких авторов сразу"""
+
+        ids = self.get_batch_ids(request)
+        with transaction.atomic():
+            if request.method == 'POST':
+                added, results = self.add_links(
+                    Follow,
+                    'author_id',
+                    ids,
+                    CustomUser.objects.filter(id__in=ids).values_list(
+                        'id', flat=True
+                    ),
+                    rejected={request.user.id: 'self'},
+                )
+                if added:
+                    bump_count_generation('users')
+            else:
+                _, results = self.remove_links(Follow, 'author_id', ids)
+        return Response({'results': results})
+
 
 # ---------------------------------------------------------------------------------
 #                            Рецепты, теги и ингридиенты
 # ---------------------------------------------------------------------------------
 
 
-class IngredientViewSet(ReadOnlyModelViewSet):
+class IngredientViewSet(TimingMixin, CatalogCacheMixin,
+                        ReadOnlyModelViewSet):
     """Вьюстер для работы с объектами модели Ingredient"""
 
     queryset = Ingredient.objects.all()
@@ -99,10 +198,23 @@ class IngredientViewSet(ReadOnlyModelViewSet):
     permission_classes = (AllowAny,)
     filter_backends = (DjangoFilterBackend,)
     filterset_class = IngredientFilter
-    seasrch_fields = ('name',)
+
+    def list(self, request, *args, **kwargs):
+        """Метод для поиска ингредиентов по индексу в памяти"""
+
+        name = request.query_params.get('name')
+        if name is None:
+            return super().list(request, *args, **kwargs)
+        try:
+            limit = int(request.query_params.get(
+                'limit', INGREDIENT_SEARCH_LIMIT
+            ))
+        except ValueError:
+            raise ValidationError({'limit': 'limit должен быть числом'})
+        return Response(ingredient_index.index.search(name, max(limit, 0)))
 
 
-class TagViewSet(ReadOnlyModelViewSet):
+class TagViewSet(TimingMixin, CatalogCacheMixin, ReadOnlyModelViewSet):
     """Вьюстер для работы с объектами модели Tag"""
 
     queryset = Tag.objects.all()
@@ -110,15 +222,70 @@ class TagViewSet(ReadOnlyModelViewSet):
     permission_classes = (AllowAny,)
 
 
-class RecipeViewSet(ModelViewSet):
+class RecipeViewSet(TimingMixin, BatchLinkMixin, ModelViewSet):
     """Вьюстер для работы с объектами модели Recipe"""
 
     queryset = Recipe.objects.all()
-    pagination_class = MyPagination
+    pagination_class = CachedCountPagination
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
     permission_classes = (IsAuthorOrReadOnly,)
 
+    def get_queryset(self):
+        """Метод для получения рецептов с флагами пользователя.
+
+        Флаги избранного, корзины и подписки на автора вычисляются
+        через Exists, связанные объекты подгружаются заранее, поэтому
+        число запросов не зависит от размера страницы.
+        """
+
+        user = self.request.user
+        if user.is_anonymous:
+            is_favorited = is_in_shopping_cart = is_subscribed = Value(False)
+        else:
+            is_favorited = Exists(Favorite.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            ))
+            is_in_shopping_cart = Exists(ShoppingCart.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            ))
+            is_subscribed = Exists(Follow.objects.filter(
+                user=user, author=OuterRef('pk')
+            ))
+        return Recipe.objects.defer('search_vector').annotate(
+            is_favorited=is_favorited,
+            is_in_shopping_cart=is_in_shopping_cart,
+        ).prefetch_related(
+            Prefetch(
+                'author',
+                queryset=CustomUser.objects.annotate(
+                    is_subscribed=is_subscribed
+                ),
+            ),
+            'tags',
+            Prefetch(
+                'ingredient_recipe',
+                queryset=IngredientRecipe.objects.select_related('ingredient'),
+            ),
+        )
+
+    @property
+    def paginator(self):
+        """Пагинатор по ключу, если в запросе передан cursor"""
+
+        if not hasattr(self, '_paginator'):
+            if (RecipeCursorPagination.cursor_query_param
+                    in self.request.query_params):
+                self._paginator = RecipeCursorPagination()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
+    def perform_destroy(self, instance):
+        """Метод удаления рецепта из списков покупок и индексов"""
+
+        delete_recipe(instance)
+
     def get_serializer_class(self):
         """Метод выбора сериализатора"""
 
@@ -152,14 +319,17 @@ class RecipeViewSet(ModelViewSet):
                     {'errors': f'Нельзя добавить \"{recipe.name}\" дважды'},
                     status=status.HTTP_400_BAD_REQUEST
                 )
-            Favorite.objects.create(user=user, recipe=recipe)
+            with transaction.atomic():
+                Favorite.objects.create(user=user, recipe=recipe)
             serializer = FavoritSerializer(recipe)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
 
         if request.method == 'DELETE':
-            object = Favorite.objects.filter(user=user, recipe=recipe)
-            if object.exists():
-                object.delete()
+            with transaction.atomic():
+                deleted, _ = Favorite.objects.filter(
+                    user=user, recipe=recipe
+                ).delete()
+            if deleted:
                 return Response(status=status.HTTP_204_NO_CONTENT)
             return Response(
                 {'errors': f'Рецепта \"{recipe.name}\" нет в избранном'},
@@ -186,14 +356,20 @@ class RecipeViewSet(ModelViewSet):
                     {'errors': f'Нельзя добавить \"{recipe.name}\" дважды'},
                     status=status.HTTP_400_BAD_REQUEST
                 )
-            ShoppingCart.objects.create(user=user, recipe=recipe)
+            with transaction.atomic():
+                ShoppingCart.objects.create(user=user, recipe=recipe)
+                shopping_list.add_recipe(user.id, recipe.id)
             serializer = FavoritSerializer(recipe)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
 
         if request.method == 'DELETE':
-            object = ShoppingCart.objects.filter(user=user, recipe__id=pk)
-            if object.exists():
-                object.delete()
+            with transaction.atomic():
+                deleted, _ = ShoppingCart.objects.filter(
+                    user=user, recipe__id=pk
+                ).delete()
+                if deleted:
+                    shopping_list.remove_recipe(user.id, recipe.id)
+            if deleted:
                 return Response(status=status.HTTP_204_NO_CONTENT)
             return Response(
                 {'errors': f'Рецепта \"{recipe.name}\" нет в списке покупок'},
@@ -201,34 +377,162 @@ class RecipeViewSet(ModelViewSet):
             )
         return Response
 
-    @staticmethod
-    def ingredients_to_txt(ingredients):
-        """Метод для объединения ингредиентов в список для загрузки"""
+    def change_batch(self, request, model, on_add=None, on_remove=None):
+        """Метод для пакетного изменения избранного или корзины"""
+
+        ids = self.get_batch_ids(request)
+        with transaction.atomic():
+            if request.method == 'POST':
+                changed, results = self.add_links(
+                    model,
+                    'recipe_id',
+                    ids,
+                    Recipe.objects.filter(id__in=ids).values_list(
+                        'id', flat=True
+                    ),
+                )
+                if changed:
+                    bump_count_generation('recipes')
+                    if on_add:
+                        on_add(request.user.id, changed)
+            else:
+                changed, results = self.remove_links(model, 'recipe_id', ids)
+                if changed and on_remove:
+                    on_remove(request.user.id, changed)
+        return Response({'results': results})
+
+    @action(
+        detail=False,
+        methods=('post', 'delete'),
+        permission_classes=(IsAuthenticated,),
+        url_path='favorite',
+        url_name='favorite-batch',
+    )
+    def favorite_batch(self, request):
+        """Метод для добавления и удаления нескольких рецептов в избранном"""
+
+        return self.change_batch(request, Favorite)
+
+    @action(
+        detail=False,
+        methods=('post', 'delete'),
+        permission_classes=(IsAuthenticated,),
+        url_path='shopping_cart',
+        url_name='shopping_cart-batch',
+    )
+    def shopping_cart_batch(self, request):
+        """Метод для добавления и удаления нескольких рецептов в корзине"""
+
+        return self.change_batch(
+            request,
+            ShoppingCart,
+            on_add=shopping_list.add_recipes,
+            on_remove=shopping_list.remove_recipes,
+        )
 
-        shopping_list = ''
-        for ingredient in ingredients:
-            shopping_list += (
-                f"{ingredient['ingredient__name']}  - "
-                f"{ingredient['sum']}"
-                f"({ingredient['ingredient__measurement_unit']})\n"
+    @action(
+        detail=True,
+        methods=('get',),
+        permission_classes=(AllowAny,),
+        url_path='similar',
+        url_name='similar',
+    )
+    def similar(self, request, pk):
+        """Метод для получения рецептов с похожими ингредиентами и тегами"""
+
+        recipe = get_object_or_404(Recipe, id=pk)
+        try:
+            limit = int(request.query_params.get('limit', SIMILAR_LIMIT))
+        except ValueError:
+            raise ValidationError({'limit': 'limit должен быть числом'})
+        scored = similarity.similar_recipes(
+            recipe.id, min(max(limit, 0), SIMILAR_MAX_LIMIT)
+        )
+        recipes = Recipe.objects.only(
+            'id', 'name', 'image', 'image_renditions', 'cooking_time'
+        ).in_bulk([recipe_id for recipe_id, _ in scored])
+        objects = []
+        for recipe_id, score in scored:
+            if recipe_id in recipes:
+                recipes[recipe_id].similarity = score
+                objects.append(recipes[recipe_id])
+        return Response(SimilarRecipeSerializer(objects, many=True).data)
+
+    @action(
+        detail=False,
+        methods=('get',),
+        permission_classes=(AllowAny,),
+        url_path='pantry',
+        url_name='pantry',
+    )
+    def pantry(self, request):
+        """Метод для подбора рецептов по имеющимся ингредиентам.
+
+        Рецепты ранжируются по доле ингредиентов, которые уже есть
+        у пользователя, при равенстве - по числу недостающих.
+        """
+
+        try:
+            ingredients = [
+                int(pk) for pk in
+                request.query_params.get('ingredients', '').split(',') if pk
+            ]
+        except ValueError:
+            raise ValidationError(
+                {'ingredients': 'Укажите id ингредиентов через запятую'}
             )
-        return shopping_list
+        if not ingredients:
+            raise ValidationError(
+                {'ingredients': 'Список ингредиентов не должен быть пустым'}
+            )
+        paginator = MyPagination()
+        page = paginator.paginate_queryset(
+            recipe_index.rank_by_pantry(ingredients), request, view=self
+        )
+        recipes = self.get_queryset().in_bulk(
+            [recipe_id for recipe_id, _, _ in page]
+        )
+        objects = []
+        for recipe_id, coverage, missing in page:
+            recipe = recipes.get(recipe_id)
+            if recipe is not None:
+                recipe.coverage = coverage
+                recipe.missing = missing
+                objects.append(recipe)
+        serializer = PantryRecipeSerializer(
+            objects, many=True, context=self.get_serializer_context()
+        )
+        return paginator.get_paginated_response(serializer.data)
 
     @action(
         detail=False,
         methods=('get',),
         permission_classes=(IsAuthenticated,),
+        renderer_classes=(TxtShoppingListRenderer, CsvShoppingListRenderer,
+                          JsonShoppingListRenderer),
         url_path='download_shopping_cart',
         url_name='download_shopping_cart',
     )
     def download_shopping_cart(self, request):
-        """Метод для скачивания файла с ингридиентами"""
+        """Метод для скачивания файла с ингридиентами.
+
+        Формат выбирается параметром format (txt, csv или json),
+        файл отдается потоком прямо из итератора по базе данных.
+        """
 
-        ingredients = IngredientRecipe.objects.filter(
-            recipe__shopping_cart__user=request.user
+        ingredients = ShoppingListItem.objects.filter(
+            user=request.user
         ).values(
             'ingredient__name',
-            'ingredient__measurement_unit'
-        ).annotate(sum=Sum('amount'))
-        shopping_list = self.ingredients_to_txt(ingredients)
-        return HttpResponse(shopping_list, content_type='text/plain')
+            'ingredient__measurement_unit',
+            sum=F('total_amount'),
+        ).order_by('ingredient__name')
+        renderer = request.accepted_renderer
+        response = StreamingHttpResponse(
+            renderer.stream(ingredients.iterator()),
+            content_type=f'{renderer.media_type}; charset={renderer.charset}'
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="shopping_list.{renderer.extension}"'
+        )
+        return response
@@ -0,0 +1,68 @@
+from functools import partial
+
+from django.core.cache import caches
+from django.core.paginator import Paginator
+from django.db import connection, transaction
+from django.utils.functional import cached_property
+
+ESTIMATE_THRESHOLD = 100000
+ADMIN_COUNT_LIMIT = 10000
+
+
+def count_generation_key(namespace):
+    return f'count_generation:{namespace}'
+
+
+def increment_count_generation(namespace):
+    try:
+        caches['versions'].incr(count_generation_key(namespace))
+    except ValueError:
+        caches['versions'].set(count_generation_key(namespace), 1, None)
+
+
+def bump_count_generation(namespace):
+    """Функция для сброса кэшированных количеств в пространстве имен.
+
+    Поколение меняется после фиксации транзакции, иначе параллельный
+    запрос успеет закэшировать количество по старым данным под новым
+    поколением.
+    """
+
+    transaction.on_commit(partial(increment_count_generation, namespace))
+
+
+def estimate_count(table):
+    """Функция для оценки числа строк таблицы по статистике PostgreSQL"""
+
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT reltuples::bigint FROM pg_class WHERE relname = %s',
+            (table,)
+        )
+        row = cursor.fetchone()
+    if row is None or row[0] < ESTIMATE_THRESHOLD:
+        return None
+    return row[0]
+
+
+class EstimatedCountPaginator(Paginator):
+    """Пагинатор Django с оценкой количества для больших таблиц.
+
+    Для queryset без условий отбора количество берется из статистики
+    PostgreSQL, если таблица больше ESTIMATE_THRESHOLD строк. С
+    условиями (поиск, фильтры, автодополнение) считается не больше
+    ADMIN_COUNT_LIMIT + 1 строк, чтобы подсчет не читал всю таблицу.
+    """
+
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, 'query', None)
+        if query is None:
+            return super().count
+        if not query.where:
+            count = estimate_count(self.object_list.model._meta.db_table)
+            if count is not None:
+                return count
+        return self.object_list[:ADMIN_COUNT_LIMIT + 1].count()
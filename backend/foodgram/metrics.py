@@ -0,0 +1,109 @@
+import ipaddress
+import os
+from hmac import compare_digest
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY,
+                               CollectorRegistry, Counter, Histogram,
+                               generate_latest, multiprocess)
+
+LATENCY_BUCKETS = (
+    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10
+)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+SIZE_BUCKETS = (
+    256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304
+)
+REQUEST_LABELS = ('view', 'action', 'method', 'status')
+
+REQUEST_LATENCY = Histogram(
+    'foodgram_request_duration_seconds',
+    'Время обработки запроса',
+    REQUEST_LABELS,
+    buckets=LATENCY_BUCKETS,
+)
+REQUEST_QUERIES = Histogram(
+    'foodgram_request_db_queries',
+    'Число SQL-запросов на запрос',
+    REQUEST_LABELS,
+    buckets=QUERY_BUCKETS,
+)
+RESPONSE_SIZE = Histogram(
+    'foodgram_response_size_bytes',
+    'Размер тела ответа',
+    REQUEST_LABELS,
+    buckets=SIZE_BUCKETS,
+)
+CACHE_REQUESTS = Counter(
+    'foodgram_cache_requests',
+    'Обращения к кэшу по результату',
+    ('cache', 'result'),
+)
+
+
+def observe_request(labels, duration, queries, size):
+    """Функция для записи метрик одного запроса"""
+
+    REQUEST_LATENCY.labels(*labels).observe(duration)
+    REQUEST_QUERIES.labels(*labels).observe(queries)
+    if size is not None:
+        RESPONSE_SIZE.labels(*labels).observe(size)
+
+
+def cache_result(name, hit):
+    """Функция для учета попадания или промаха кэша name"""
+
+    CACHE_REQUESTS.labels(name, 'hit' if hit else 'miss').inc()
+
+
+def get_registry():
+    """Функция для получения реестра метрик всех процессов.
+
+    Если задан PROMETHEUS_MULTIPROC_DIR, каждый процесс gunicorn
+    пишет значения в свои файлы в этом каталоге, а реестр собирает
+    их при каждом чтении.
+    """
+
+    if not os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def allowed(request):
+    """Функция для проверки доступа к метрикам.
+
+    Доступ есть с адресов из METRICS['ALLOWED_NETWORKS'] или с
+    заголовком "Authorization: Bearer <METRICS['TOKEN']>", если
+    токен задан.
+    """
+
+    options = settings.METRICS
+    token = options.get('TOKEN')
+    header = request.headers.get('Authorization', '')
+    if token and compare_digest(header, f'Bearer {token}'):
+        return True
+    try:
+        address = ipaddress.ip_address(request.META.get('REMOTE_ADDR', ''))
+    except ValueError:
+        return False
+    return any(
+        address in ipaddress.ip_network(network.strip())
+        for network in options.get('ALLOWED_NETWORKS', ())
+        if network.strip()
+    )
+
+
+def metrics_view(request):
+    """Функция для выдачи метрик в текстовом формате Prometheus.
+
+    Путь не проксируется nginx, а доступ ограничен функцией allowed.
+    """
+
+    if not allowed(request):
+        return HttpResponseForbidden()
+    return HttpResponse(
+        generate_latest(get_registry()), content_type=CONTENT_TYPE_LATEST
+    )
@@ -13,7 +13,7 @@ SECRET_KEY = os.getenv('SECRET_KEY', get_random_secret_key())
 
 DEBUG = False
 
-ALLOWED_HOSTS = ['84.252.136.215', '127.0.0.1', 'localhost', 'foodgram101.hopto.org']
+ALLOWED_HOSTS = ['84.252.136.215', '127.0.0.1', 'localhost', 'foodgram101.hopto.org', 'backend']
 # ALLOWED_HOSTS = ['*']
 
 AUTH_USER_MODEL = 'users.CustomUser'
@@ -30,6 +30,7 @@ INSTALLED_APPS = [
     'recipes.apps.RecipesConfig',
     'users.apps.UsersConfig',
     'api.apps.ApiConfig',
+    'jobs.apps.JobsConfig',
     'rest_framework',
     'rest_framework.authtoken',
     'djoser',
@@ -37,6 +38,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.ServerTimingMiddleware',
+    'api.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -78,6 +81,37 @@ DATABASES = {
     }
 }
 
+# Кэш общий для backend и worker: Redis, если задан REDIS_URL, иначе
+# файлы (только для локального запуска в одном контейнере). Версии
+# справочников и поколения счетчиков лежат в отдельном кэше versions:
+# их ключи без срока жизни и не вытесняются вместе с остальными.
+REDIS_URL = os.getenv('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        },
+        'versions': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'KEY_PREFIX': 'versions',
+        },
+    }
+else:
+    CACHE_LOCATION = os.getenv('CACHE_LOCATION', '/tmp/foodgram_cache')
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': CACHE_LOCATION,
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        },
+        'versions': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': f'{CACHE_LOCATION}_versions',
+        },
+    }
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -108,6 +142,11 @@ STATIC_ROOT = BASE_DIR / 'collected_static'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Файлы из multipart сразу пишутся во временный файл, а не в память
+FILE_UPLOAD_HANDLERS = [
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
@@ -118,6 +157,11 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.TokenAuthentication',
     ],
+
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.TimedJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
 
 DJOSER = {
@@ -135,3 +179,33 @@ DJOSER = {
         'user_list': ['rest_framework.permissions.AllowAny']
     },
 }
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'jobs': {'handlers': ['console'], 'level': 'INFO'},
+        'api.timing': {'handlers': ['console'], 'level': 'INFO'},
+    },
+}
+
+# Замеры запросов: заголовок Server-Timing и строка JSON в лог api.timing
+# для доли запросов SAMPLE_RATE, включаются REQUEST_TIMING_ENABLED=True
+# Доступ к /metrics: адреса из ALLOWED_NETWORKS или заголовок
+# "Authorization: Bearer <TOKEN>", если TOKEN задан
+METRICS = {
+    'ALLOWED_NETWORKS': os.getenv(
+        'METRICS_ALLOWED_NETWORKS', '127.0.0.1/32'
+    ).split(','),
+    'TOKEN': os.getenv('METRICS_TOKEN', ''),
+}
+
+REQUEST_TIMING = {
+    'ENABLED': os.getenv('REQUEST_TIMING_ENABLED', 'False') == 'True',
+    'SAMPLE_RATE': float(os.getenv('REQUEST_TIMING_SAMPLE_RATE', '0.05')),
+    'DUPLICATE_THRESHOLD': 3,
+    'SLOW_MS': 500,
+}
@@ -0,0 +1,21 @@
+import os
+import shutil
+
+workers = int(os.getenv('GUNICORN_WORKERS', 3))
+
+# Метрики Prometheus каждого воркера пишутся в файлы этого каталога и
+# суммируются при чтении /metrics. Переменная задается до загрузки
+# приложения, чтобы ее видели все воркеры.
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/prometheus')
+
+
+def on_starting(server):
+    directory = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(directory, ignore_errors=True)
+    os.makedirs(directory)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,13 @@
+from django.contrib.admin import ModelAdmin, register
+
+from .models import Job
+
+
+@register(Job)
+class JobAdmin(ModelAdmin):
+    list_display = ('pk', 'name', 'status', 'attempts', 'run_at',
+                    'wait_time', 'duration')
+    list_filter = ('status', 'name')
+    search_fields = ('name',)
+    readonly_fields = ('created', 'started', 'finished', 'wait_time',
+                       'duration', 'last_error')
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Avg, Count, Max, Q
+from jobs.models import Job
+
+
+class Command(BaseCommand):
+    """Команда для вывода статистики выполнения фоновых задач"""
+
+    help = 'Показывает число, время выполнения и ожидания задач по типам'
+
+    def handle(self, *args, **options):
+        stats = Job.objects.values('name').annotate(
+            total=Count('id'),
+            queued=Count('id', filter=Q(status=Job.QUEUED)),
+            failed=Count('id', filter=Q(status=Job.FAILED)),
+            avg_duration=Avg('duration', filter=Q(status=Job.DONE)),
+            max_duration=Max('duration', filter=Q(status=Job.DONE)),
+            avg_wait=Avg('wait_time'),
+        ).order_by('name')
+        for row in stats:
+            self.stdout.write(
+                f'{row["name"]}: всего {row["total"]}, '
+                f'в очереди {row["queued"]}, ошибок {row["failed"]}, '
+                f'выполнение {row["avg_duration"] or 0:.3f} с '
+                f'(макс. {row["max_duration"] or 0:.3f} с), '
+                f'ожидание {row["avg_wait"] or 0:.3f} с'
+            )
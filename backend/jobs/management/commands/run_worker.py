@@ -0,0 +1,72 @@
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, close_old_connections
+from jobs import queue
+
+POLL_INTERVAL = 1
+MAINTENANCE_INTERVAL = 60 * 60
+
+
+class Command(BaseCommand):
+    """Команда для запуска воркера фоновых задач.
+
+    Воркер забирает задачи из таблицы Job по одной, пока очередь не
+    опустеет, затем ждет POLL_INTERVAL секунд. По SIGTERM и SIGINT
+    текущая задача дорабатывает, и воркер завершается.
+
+    Перед каждой итерацией закрываются устаревшие и сломанные
+    соединения, как это делает Django между запросами. Если база
+    недоступна, воркер ждет и пробует снова, а не падает.
+    """
+
+    help = 'Выполняет фоновые задачи из очереди в базе данных'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Выполнить готовые задачи и завершиться',
+        )
+        parser.add_argument('--poll-interval', type=float,
+                            default=POLL_INTERVAL)
+
+    def stop(self, *args):
+        self.running = False
+
+    def maintenance(self):
+        requeued = queue.requeue_stale()
+        purged = queue.purge()
+        if requeued or purged:
+            self.stderr.write(
+                f'Возвращено в очередь: {requeued}, удалено: {purged}'
+            )
+
+    def handle(self, *args, **options):
+        self.running = True
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        self.maintenance()
+        maintained = time.monotonic()
+        processed = 0
+        while self.running:
+            close_old_connections()
+            try:
+                job = queue.claim_job()
+                if job is not None:
+                    queue.run_job(job)
+                    processed += 1
+                    continue
+                if options['once']:
+                    break
+                if time.monotonic() - maintained > MAINTENANCE_INTERVAL:
+                    self.maintenance()
+                    maintained = time.monotonic()
+            except OperationalError as error:
+                self.stderr.write(f'Ошибка базы данных: {error}')
+                close_old_connections()
+            time.sleep(options['poll_interval'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Воркер остановлен, выполнено задач: {processed}'
+        ))
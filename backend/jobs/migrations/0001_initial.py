@@ -0,0 +1,39 @@
+# Generated by Django 4.2.5 on 2026-10-18 02:18
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200, verbose_name='задача')),
+                ('payload', models.JSONField(default=dict, verbose_name='аргументы')),
+                ('status', models.CharField(choices=[('queued', 'в очереди'), ('running', 'выполняется'), ('done', 'выполнена'), ('failed', 'ошибка')], default='queued', max_length=10, verbose_name='статус')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='попыток')),
+                ('max_attempts', models.PositiveSmallIntegerField(default=5, verbose_name='максимум попыток')),
+                ('run_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='запустить после')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='создана')),
+                ('started', models.DateTimeField(blank=True, null=True, verbose_name='начата')),
+                ('finished', models.DateTimeField(blank=True, null=True, verbose_name='завершена')),
+                ('wait_time', models.FloatField(blank=True, null=True, verbose_name='ожидание в очереди, с')),
+                ('duration', models.FloatField(blank=True, null=True, verbose_name='время выполнения, с')),
+                ('last_error', models.TextField(blank=True, verbose_name='последняя ошибка')),
+            ],
+            options={
+                'verbose_name': 'фоновая задача',
+                'verbose_name_plural': 'фоновые задачи',
+                'ordering': ('-id',),
+                'indexes': [models.Index(fields=['status', 'run_at'], name='job_queue_idx')],
+            },
+        ),
+    ]
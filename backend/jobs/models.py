@@ -0,0 +1,83 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Job(models.Model):
+    """Модель для описания фоновой задачи"""
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (QUEUED, 'в очереди'),
+        (RUNNING, 'выполняется'),
+        (DONE, 'выполнена'),
+        (FAILED, 'ошибка'),
+    )
+
+    name = models.CharField(
+        max_length=200,
+        verbose_name='задача',
+    )
+    payload = models.JSONField(
+        default=dict,
+        verbose_name='аргументы',
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=STATUSES,
+        default=QUEUED,
+        verbose_name='статус',
+    )
+    attempts = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name='попыток',
+    )
+    max_attempts = models.PositiveSmallIntegerField(
+        default=5,
+        verbose_name='максимум попыток',
+    )
+    run_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name='запустить после',
+    )
+    created = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='создана',
+    )
+    started = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='начата',
+    )
+    finished = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='завершена',
+    )
+    wait_time = models.FloatField(
+        null=True,
+        blank=True,
+        verbose_name='ожидание в очереди, с',
+    )
+    duration = models.FloatField(
+        null=True,
+        blank=True,
+        verbose_name='время выполнения, с',
+    )
+    last_error = models.TextField(
+        blank=True,
+        verbose_name='последняя ошибка',
+    )
+
+    class Meta:
+        verbose_name = 'фоновая задача'
+        verbose_name_plural = 'фоновые задачи'
+        ordering = ('-id',)
+        indexes = (
+            models.Index(fields=('status', 'run_at'), name='job_queue_idx'),
+        )
+
+    def __str__(self):
+        return f'{self.name} #{self.pk} ({self.status})'
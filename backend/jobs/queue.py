@@ -0,0 +1,151 @@
+import logging
+import random
+import time
+import traceback
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger('jobs')
+
+BACKOFF_BASE = 10
+BACKOFF_MAX = 60 * 60
+STALE_AFTER = 15 * 60
+KEEP_DAYS = 7
+
+TASKS = {}
+
+
+def task(function=None, *, max_attempts=5):
+    """Декоратор для регистрации функции как фоновой задачи.
+
+    Задача регистрируется под именем "модуль.функция" и вызывается
+    воркером с аргументами из Job.payload, поэтому аргументы должны
+    сериализоваться в JSON.
+    """
+
+    def register(function):
+        function.task_name = f'{function.__module__}.{function.__name__}'
+        function.max_attempts = max_attempts
+        TASKS[function.task_name] = function
+        return function
+
+    if function is not None:
+        return register(function)
+    return register
+
+
+def enqueue(function, delay=0, unique=False, **payload):
+    """Функция для постановки задачи в очередь.
+
+    Задача записывается в ту же транзакцию, что и изменения, которые
+    ее породили, поэтому при откате транзакции она не выполнится.
+    С unique=True новая задача не создается, если такая же задача
+    с тем же payload еще ждет в очереди: возвращается она.
+    """
+
+    if unique:
+        job = Job.objects.filter(
+            name=function.task_name, status=Job.QUEUED, payload=payload
+        ).first()
+        if job is not None:
+            return job
+    return Job.objects.create(
+        name=function.task_name,
+        payload=payload,
+        max_attempts=function.max_attempts,
+        run_at=timezone.now() + timedelta(seconds=delay),
+    )
+
+
+def backoff(attempt):
+    """Функция для расчета паузы перед повтором задачи, в секундах"""
+
+    delay = min(BACKOFF_BASE * 2 ** (attempt - 1), BACKOFF_MAX)
+    return delay + random.uniform(0, delay / 10)
+
+
+def claim_job():
+    """Функция для захвата следующей готовой задачи.
+
+    Строка блокируется с SKIP LOCKED, поэтому несколько воркеров
+    разбирают очередь параллельно, не получая одну задачу дважды.
+    """
+
+    with transaction.atomic():
+        job = Job.objects.select_for_update(skip_locked=True).filter(
+            status=Job.QUEUED, run_at__lte=timezone.now()
+        ).order_by('run_at', 'id').first()
+        if job is None:
+            return None
+        job.status = Job.RUNNING
+        job.attempts += 1
+        job.started = timezone.now()
+        job.wait_time = (job.started - job.run_at).total_seconds()
+        job.save(update_fields=('status', 'attempts', 'started', 'wait_time'))
+    return job
+
+
+def run_job(job):
+    """Функция для выполнения задачи и записи результата"""
+
+    started = time.monotonic()
+    try:
+        function = TASKS[job.name]
+        function(**job.payload)
+    except Exception:
+        job.duration = time.monotonic() - started
+        job.last_error = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            job.status = Job.QUEUED
+            job.run_at = timezone.now() + timedelta(
+                seconds=backoff(job.attempts)
+            )
+        else:
+            job.status = Job.FAILED
+            job.finished = timezone.now()
+        logger.exception(
+            'Задача %s #%s: попытка %s из %s не удалась',
+            job.name, job.pk, job.attempts, job.max_attempts,
+        )
+    else:
+        job.duration = time.monotonic() - started
+        job.status = Job.DONE
+        job.finished = timezone.now()
+        logger.info(
+            'Задача %s #%s выполнена за %.3f с, ожидание %.3f с',
+            job.name, job.pk, job.duration, job.wait_time,
+        )
+    job.save(update_fields=(
+        'status', 'run_at', 'finished', 'duration', 'last_error'
+    ))
+    return job
+
+
+def requeue_stale(seconds=STALE_AFTER):
+    """Функция для возврата в очередь задач, брошенных упавшим воркером"""
+
+    stale = Job.objects.filter(
+        status=Job.RUNNING,
+        started__lt=timezone.now() - timedelta(seconds=seconds),
+    )
+    stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Job.FAILED,
+        finished=timezone.now(),
+        last_error='Воркер не завершил задачу',
+    )
+    return stale.update(status=Job.QUEUED, run_at=timezone.now())
+
+
+def purge(days=KEEP_DAYS):
+    """Функция для удаления старых выполненных задач"""
+
+    deleted, _ = Job.objects.filter(
+        status=Job.DONE,
+        finished__lt=timezone.now() - timedelta(days=days),
+    ).delete()
+    return deleted
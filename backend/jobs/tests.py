@@ -0,0 +1,66 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import OperationalError
+from django.test import TestCase, TransactionTestCase
+
+from . import queue
+from .models import Job
+from .queue import enqueue, task
+
+
+@task
+def noop(**payload):
+    """Задача для тестов очереди"""
+
+
+class EnqueueTest(TestCase):
+    """Тесты постановки задач в очередь"""
+
+    def test_unique_reuses_queued_job(self):
+        first = enqueue(noop, unique=True, recipe_id=1)
+        second = enqueue(noop, unique=True, recipe_id=1)
+        other = enqueue(noop, unique=True, recipe_id=2)
+        self.assertEqual(first.pk, second.pk)
+        self.assertNotEqual(first.pk, other.pk)
+
+    def test_unique_ignores_started_job(self):
+        first = enqueue(noop, unique=True, recipe_id=1)
+        Job.objects.filter(pk=first.pk).update(status=Job.RUNNING)
+        second = enqueue(noop, unique=True, recipe_id=1)
+        self.assertNotEqual(first.pk, second.pk)
+
+
+class RunWorkerTest(TransactionTestCase):
+    """Тесты цикла воркера"""
+
+    def run_worker(self):
+        stderr = StringIO()
+        call_command(
+            'run_worker', once=True, poll_interval=0,
+            stdout=StringIO(), stderr=stderr,
+        )
+        return stderr.getvalue()
+
+    def test_runs_queued_jobs(self):
+        job = enqueue(noop, recipe_id=1)
+        self.run_worker()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.DONE)
+
+    def test_survives_operational_error(self):
+        job = enqueue(noop, recipe_id=1)
+        errors = [OperationalError('connection lost')]
+        claim_job = queue.claim_job
+
+        def claim():
+            if errors:
+                raise errors.pop()
+            return claim_job()
+
+        with mock.patch.object(queue, 'claim_job', side_effect=claim):
+            stderr = self.run_worker()
+        self.assertIn('connection lost', stderr)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.DONE)
@@ -1,43 +1,204 @@
-from django.contrib.admin import ModelAdmin, register
+from django.contrib.admin import ModelAdmin, TabularInline, register
+from django.db import transaction
+from foodgram.counts import EstimatedCountPaginator
 
+from . import changes, shopping_list
 from .models import (Favorite, Ingredient, IngredientRecipe, Recipe,
-                     ShoppingCart, Tag, TagRecipe)
+                     ShoppingCart, ShoppingListItem, Tag, TagRecipe)
+from .tasks import delete_recipe
+
+
+class LargeTableAdmin(ModelAdmin):
+    """Базовый класс админки для больших таблиц.
+
+    Общее количество строк не считается, а количество без фильтров
+    оценивается по статистике PostgreSQL.
+    """
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+class RecipeLinkAdmin(LargeTableAdmin):
+    """Базовый класс админки для связей рецепта с ингредиентами и тегами.
+
+    Изменения и удаления проходят через changes.tracked, чтобы списки
+    покупок и индексы рецептов не расходились с таблицей связей.
+    """
+
+    def save_model(self, request, obj, form, change):
+        with changes.tracked((obj.recipe_id, form.initial.get('recipe'))):
+            super().save_model(request, obj, form, change)
+
+    def delete_model(self, request, obj):
+        with changes.tracked((obj.recipe_id,)):
+            super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        with changes.tracked(queryset.values_list('recipe_id', flat=True)):
+            super().delete_queryset(request, queryset)
+
+
+class RecipeCatalogAdminMixin:
+    """Миксин админки для ингредиентов и тегов.
+
+    Удаление каскадно удаляет связи с рецептами, поэтому оно проходит
+    через changes.tracked по всем затронутым рецептам.
+    """
+
+    link_model = None
+    link_field = None
+
+    def linked_recipes(self, objects):
+        return self.link_model.objects.filter(
+            **{f'{self.link_field}__in': objects}
+        ).values_list('recipe_id', flat=True)
+
+    def delete_model(self, request, obj):
+        with changes.tracked(self.linked_recipes((obj,))):
+            super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        with changes.tracked(self.linked_recipes(queryset)):
+            super().delete_queryset(request, queryset)
 
 
 @register(Ingredient)
-class IngredientAdmin(ModelAdmin):
+class IngredientAdmin(RecipeCatalogAdminMixin, LargeTableAdmin):
+    link_model = IngredientRecipe
+    link_field = 'ingredient'
     list_display = ('id', 'name', 'measurement_unit')
     search_fields = ('name',)
 
 
+class IngredientRecipeInline(TabularInline):
+    model = IngredientRecipe
+    autocomplete_fields = ('ingredient',)
+    extra = 0
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related(
+            'recipe', 'ingredient'
+        )
+
+
+class TagRecipeInline(TabularInline):
+    model = TagRecipe
+    autocomplete_fields = ('tag',)
+    extra = 0
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('recipe', 'tag')
+
+
 @register(Recipe)
-class RecipeAdmin(ModelAdmin):
+class RecipeAdmin(LargeTableAdmin):
     list_display = ('id', 'author', 'name', 'text',
-                    'cooking_time', 'created')
-    serch_filter = ('author', 'name', 'tags',)
+                    'cooking_time', 'created', 'favorites_count',
+                    'carts_count')
+    list_select_related = ('author',)
+    search_fields = ('name',)
     list_filter = ('tags',)
+    autocomplete_fields = ('author',)
+    readonly_fields = ('favorites_count', 'carts_count')
+    inlines = (IngredientRecipeInline, TagRecipeInline)
+
+    def save_related(self, request, form, formsets, change):
+        with changes.tracked((form.instance.pk,)):
+            super().save_related(request, form, formsets, change)
+
+    def delete_model(self, request, obj):
+        delete_recipe(obj)
+
+    def delete_queryset(self, request, queryset):
+        for recipe in queryset:
+            delete_recipe(recipe)
 
 
 @register(Tag)
-class TagAdmin(ModelAdmin):
+class TagAdmin(RecipeCatalogAdminMixin, ModelAdmin):
+    link_model = TagRecipe
+    link_field = 'tag'
     list_display = ('pk', 'name', 'color', 'slug')
+    search_fields = ('name', 'slug')
 
 
 @register(IngredientRecipe)
-class IngredientRecipe(ModelAdmin):
+class IngredientRecipeAdmin(RecipeLinkAdmin):
     list_display = ('pk', 'recipe', 'ingredient', 'amount')
+    list_select_related = ('recipe', 'ingredient')
+    autocomplete_fields = ('recipe', 'ingredient')
 
 
 @register(ShoppingCart)
-class ShoppingCartAdmin(ModelAdmin):
+class ShoppingCartAdmin(LargeTableAdmin):
+    """Админка корзин.
+
+    Добавление и удаление меняют списки покупок так же, как API.
+    Пользователь и рецепт существующей корзины не редактируются.
+    """
+
     list_display = ('pk', 'user', 'recipe')
+    list_select_related = ('user', 'recipe')
+    autocomplete_fields = ('user', 'recipe')
+
+    def get_readonly_fields(self, request, obj=None):
+        if obj is not None:
+            return ('user', 'recipe')
+        return ()
+
+    def save_model(self, request, obj, form, change):
+        with transaction.atomic():
+            super().save_model(request, obj, form, change)
+            if not change:
+                shopping_list.add_recipe(obj.user_id, obj.recipe_id)
+
+    def delete_model(self, request, obj):
+        with transaction.atomic():
+            super().delete_model(request, obj)
+            shopping_list.remove_recipe(obj.user_id, obj.recipe_id)
+
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            carts = {}
+            for user_id, recipe_id in queryset.select_for_update(
+            ).values_list('user_id', 'recipe_id'):
+                carts.setdefault(user_id, []).append(recipe_id)
+            super().delete_queryset(request, queryset)
+            for user_id, recipe_ids in carts.items():
+                shopping_list.remove_recipes(user_id, recipe_ids)
 
 
 @register(Favorite)
-class FavoriteAdmin(ModelAdmin):
+class FavoriteAdmin(LargeTableAdmin):
     list_display = ('pk', 'user', 'recipe')
+    list_select_related = ('user', 'recipe')
+    autocomplete_fields = ('user', 'recipe')
 
 
 @register(TagRecipe)
-class TagRecipeAdmin(ModelAdmin):  # поправил
+class TagRecipeAdmin(RecipeLinkAdmin):  # поправил
     list_display = ('pk', 'tag', 'recipe')
+    list_select_related = ('tag', 'recipe')
+    autocomplete_fields = ('tag', 'recipe')
+
+
+@register(ShoppingListItem)
+class ShoppingListItemAdmin(LargeTableAdmin):
+    """Админка итоговых списков покупок только для просмотра.
+
+    Таблица выводится из корзин, исправляется командой
+    rebuild_shopping_lists.
+    """
+
+    list_display = ('pk', 'user', 'ingredient', 'total_amount')
+    list_select_related = ('user', 'ingredient')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,38 @@
+import time
+import uuid
+
+from django.core.cache import caches
+from foodgram.metrics import cache_result
+
+VERSION_KEY = 'catalog_version'
+
+
+def new_version():
+    """Функция для создания новой версии справочников"""
+
+    return {'version': uuid.uuid4().hex, 'modified': int(time.time())}
+
+
+def get_version(key=VERSION_KEY):
+    """Функция для получения версии справочников тегов и ингредиентов.
+
+    Версия хранится в общем кэше versions и одинакова для всех
+    процессов и контейнеров: словарь с идентификатором версии и
+    временем последнего изменения. Другой key позволяет вести так же
+    версию других данных.
+    """
+
+    versions = caches['versions']
+    version = versions.get(key)
+    cache_result(key, version is not None)
+    if version is None:
+        version = new_version()
+        if not versions.add(key, version, None):
+            version = versions.get(key)
+    return version
+
+
+def bump_version(key=VERSION_KEY):
+    """Функция для смены версии после изменения справочников"""
+
+    caches['versions'].set(key, new_version(), None)
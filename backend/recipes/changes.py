@@ -0,0 +1,69 @@
+from collections import Counter
+from contextlib import contextmanager
+
+from django.db import transaction
+
+from . import recipe_index, shopping_list, similarity
+from .models import IngredientRecipe, Recipe, TagRecipe
+
+
+def snapshot(recipe_ids):
+    """Функция для чтения ингредиентов и тегов рецептов.
+
+    Возвращает словарь {id рецепта: (Counter {id ингредиента:
+    количество}, множество id тегов)}.
+    """
+
+    state = {recipe_id: (Counter(), set()) for recipe_id in recipe_ids}
+    for recipe_id, ingredient_id, amount in IngredientRecipe.objects.filter(
+        recipe_id__in=state
+    ).values_list('recipe_id', 'ingredient_id', 'amount'):
+        state[recipe_id][0][ingredient_id] = amount
+    for recipe_id, tag_id in TagRecipe.objects.filter(
+        recipe_id__in=state
+    ).values_list('recipe_id', 'tag_id'):
+        state[recipe_id][1].add(tag_id)
+    return state
+
+
+def apply(before):
+    """Функция для обновления производных данных по разнице состояний.
+
+    Сравнивает состояние рецептов из before с текущим и обновляет
+    списки покупок, индекс ингредиентов и индекс похожих рецептов так
+    же, как это делает API при изменении рецепта.
+    """
+
+    after = snapshot(before)
+    existing = set(
+        Recipe.objects.filter(id__in=before).values_list('id', flat=True)
+    )
+    for recipe_id, (old_amounts, old_tags) in before.items():
+        new_amounts, new_tags = after[recipe_id]
+        if old_amounts != new_amounts:
+            shopping_list.change_recipe(recipe_id, old_amounts, new_amounts)
+            recipe_index.update_index(
+                recipe_id,
+                added=new_amounts.keys() - old_amounts.keys(),
+                removed=old_amounts.keys() - new_amounts.keys(),
+            )
+        if recipe_id not in existing:
+            continue
+        if (old_amounts.keys() != new_amounts.keys()
+                or old_tags != new_tags):
+            similarity.index_recipe(recipe_id, new_amounts, new_tags)
+
+
+@contextmanager
+def tracked(recipe_ids):
+    """Контекстный менеджер для прямых изменений связей рецептов.
+
+    Запоминает ингредиенты и теги рецептов до изменений внутри блока
+    и после него обновляет производные данные. Все выполняется в
+    одной транзакции.
+    """
+
+    with transaction.atomic():
+        before = snapshot(set(recipe_ids) - {None})
+        yield
+        apply(before)
@@ -0,0 +1,81 @@
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce, Greatest
+from users.models import CustomUser, Follow
+
+from .models import Favorite, Recipe, ShoppingCart
+
+
+def change(model, ids, field, delta):
+    """Функция для атомарного изменения счетчика через F()"""
+
+    if ids and delta:
+        model.objects.filter(id__in=ids).update(
+            **{field: Greatest(F(field) + delta, 0)}
+        )
+
+
+def links_changed(model, user_id, target_ids, delta):
+    """Функция для пересчета счетчиков после изменения связей.
+
+    model - Favorite, ShoppingCart или Follow, target_ids - id
+    рецептов или авторов, delta - +1 при добавлении, -1 при удалении.
+    """
+
+    if model is Favorite:
+        change(Recipe, target_ids, 'favorites_count', delta)
+    elif model is ShoppingCart:
+        change(Recipe, target_ids, 'carts_count', delta)
+    elif model is Follow:
+        change(CustomUser, target_ids, 'followers_count', delta)
+        change(CustomUser, (user_id,), 'following_count',
+               delta * len(target_ids))
+
+
+def count_of(model, field):
+    """Функция для подзапроса числа строк model на объект"""
+
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef('pk')}).order_by().values(
+            field
+        ).annotate(total=Count('id')).values('total')[:1]
+    ), 0)
+
+
+RECIPE_COUNTERS = {
+    'favorites_count': (Favorite, 'recipe'),
+    'carts_count': (ShoppingCart, 'recipe'),
+}
+USER_COUNTERS = {
+    'recipes_count': (Recipe, 'author'),
+    'followers_count': (Follow, 'author'),
+    'following_count': (Follow, 'user'),
+}
+
+
+def recount_model(model, counters):
+    """Функция для исправления счетчиков одной модели.
+
+    Строки с расхождениями находятся одним запросом и исправляются
+    одним UPDATE. Возвращает число исправленных строк.
+    """
+
+    expected = {
+        f'expected_{field}': count_of(*source)
+        for field, source in counters.items()
+    }
+    drift = Q()
+    for field in counters:
+        drift |= ~Q(**{field: F(f'expected_{field}')})
+    ids = model.objects.annotate(**expected).filter(drift).values('pk')
+    return model.objects.filter(pk__in=ids).update(**{
+        field: count_of(*source) for field, source in counters.items()
+    })
+
+
+def recount():
+    """Функция для исправления всех счетчиков рецептов и пользователей"""
+
+    return {
+        'recipes': recount_model(Recipe, RECIPE_COUNTERS),
+        'users': recount_model(CustomUser, USER_COUNTERS),
+    }
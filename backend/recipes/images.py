@@ -0,0 +1,86 @@
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+WIDTHS = (960, 640, 320)
+FORMATS = (('webp', 'WEBP'), ('jpeg', 'JPEG'))
+QUALITY = 80
+
+
+def rendition_name(name, width, extension):
+    """Функция для получения имени файла уменьшенной копии фото"""
+
+    base, _ = os.path.splitext(name)
+    return f'{base}_{width}w.{"jpg" if extension == "jpeg" else extension}'
+
+
+def target_widths(width):
+    """Функция для выбора ширин копий без увеличения оригинала"""
+
+    widths = [value for value in WIDTHS if value < width]
+    return widths or [width]
+
+
+def make_renditions(image):
+    """Функция для создания уменьшенных копий фото рецепта.
+
+    Копии сохраняются рядом с оригиналом в форматах WebP и JPEG для
+    каждой ширины из WIDTHS, которая меньше ширины оригинала. Каждая
+    следующая копия уменьшается из предыдущей, а не из оригинала.
+    Возвращает словарь для поля Recipe.image_renditions или пустой
+    словарь, если файл не удалось прочитать как изображение.
+    """
+
+    storage = image.storage
+    try:
+        with storage.open(image.name, 'rb') as file:
+            source = Image.open(file)
+            source.draft('RGB', (WIDTHS[0], WIDTHS[0]))
+            source = ImageOps.exif_transpose(source).convert('RGB')
+    except (OSError, UnidentifiedImageError, Image.DecompressionBombError):
+        return {}
+    renditions = {}
+    for width in target_widths(source.width):
+        height = max(round(source.height * width / source.width), 1)
+        source = source.resize((width, height), Image.LANCZOS)
+        files = {}
+        for extension, image_format in FORMATS:
+            buffer = BytesIO()
+            source.save(buffer, image_format, quality=QUALITY)
+            name = rendition_name(image.name, width, extension)
+            storage.delete(name)
+            files[extension] = storage.save(
+                name, ContentFile(buffer.getvalue())
+            )
+        renditions[str(width)] = files
+    return {'source': image.name, 'widths': renditions}
+
+
+def delete_renditions(renditions, storage):
+    """Функция для удаления файлов уменьшенных копий"""
+
+    for files in renditions.get('widths', {}).values():
+        for name in files.values():
+            storage.delete(name)
+
+
+def srcset(renditions, build_url):
+    """Функция для описания копий фото в формате атрибута srcset.
+
+    Возвращает словарь {формат: "url 320w, url 640w"} или None, если
+    копий нет. build_url превращает имя файла в адрес.
+    """
+
+    widths = renditions.get('widths') if renditions else None
+    if not widths:
+        return None
+    ordered = sorted(widths.items(), key=lambda item: int(item[0]))
+    return {
+        extension: ', '.join(
+            f'{build_url(files[extension])} {width}w'
+            for width, files in ordered
+        )
+        for extension, _ in FORMATS
+    }
@@ -0,0 +1,119 @@
+import threading
+import time
+from bisect import bisect_left
+
+from .catalog import get_version
+from .models import Ingredient
+
+CHECK_INTERVAL = 5
+
+
+def normalize(value):
+    """Функция для приведения названия к виду для поиска"""
+
+    return value.casefold().replace('ё', 'е').strip()
+
+
+class IngredientIndex:
+    """Индекс названий ингредиентов в памяти процесса.
+
+    Хранит отсортированные названия и начала слов внутри названий,
+    поэтому поиск по префиксу выполняется бинарным поиском. Индекс
+    перестраивается при изменении версии справочников, версия
+    проверяется не чаще одного раза в CHECK_INTERVAL секунд.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.version = None
+        self.checked_at = None
+        self.names = []
+        self.items = []
+        self.words = []
+
+    def build(self):
+        """Метод для построения индекса по таблице ингредиентов"""
+
+        rows = sorted((
+            (normalize(name), {
+                'id': pk, 'name': name, 'measurement_unit': unit
+            })
+            for pk, name, unit in Ingredient.objects.values_list(
+                'id', 'name', 'measurement_unit'
+            ).iterator()
+        ), key=lambda row: (row[0], row[1]['id']))
+        names = [name for name, _ in rows]
+        words = []
+        for position, name in enumerate(names):
+            for start in range(1, len(name)):
+                if name[start - 1] in ' -,(' and name[start] not in ' -,(':
+                    words.append((name[start:], position))
+        words.sort()
+        self.names = names
+        self.items = [item for _, item in rows]
+        self.words = words
+
+    def invalidate(self):
+        """Метод для проверки версии при следующем поиске"""
+
+        self.checked_at = None
+
+    def refresh(self):
+        """Метод для перестроения индекса при смене версии"""
+
+        now = time.monotonic()
+        if (self.checked_at is not None
+                and now - self.checked_at < CHECK_INTERVAL):
+            return
+        version = get_version()['version']
+        with self.lock:
+            if version != self.version:
+                self.build()
+                self.version = version
+            self.checked_at = now
+
+    def search(self, query, limit):
+        """Метод для поиска ингредиентов по названию.
+
+        Сначала идут совпадения с начала названия, затем с начала
+        любого слова, затем вхождения в середину слова.
+        """
+
+        self.refresh()
+        names = self.names
+        query = normalize(query)
+        if not query:
+            return self.items[:limit]
+        found = []
+        seen = set()
+
+        start = bisect_left(names, query)
+        for position in range(start, len(names)):
+            if len(found) >= limit or not names[position].startswith(query):
+                break
+            found.append(position)
+            seen.add(position)
+
+        words = self.words
+        word_matches = set()
+        if len(found) >= limit:
+            return [self.items[position] for position in found]
+        for number in range(bisect_left(words, (query,)), len(words)):
+            word, position = words[number]
+            if not word.startswith(query):
+                break
+            if position not in seen:
+                word_matches.add(position)
+        found.extend(sorted(word_matches))
+        seen.update(word_matches)
+
+        if len(found) < limit:
+            for position, name in enumerate(names):
+                if position not in seen and query in name:
+                    found.append(position)
+                    if len(found) >= limit:
+                        break
+        return [self.items[position] for position in found[:limit]]
+
+
+index = IngredientIndex()
@@ -1,26 +1,197 @@
 import csv
+import json
+import os
+from collections import defaultdict
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from foodgram.settings import CSV_FILES_DIR
+from recipes.catalog import bump_version
 from recipes.models import Ingredient
 
+BATCH_SIZE = 1000
+CHUNK_SIZE = 65536
+HEADER = ['name', 'measurement_unit']
+
 
 class Command(BaseCommand):
-    """Команда для загрузки ингредиентов в базу данных """
-
-    def import_ingredients_from_csv_file(self, *args, **kwargs):
-        with open(f'{CSV_FILES_DIR}/ingredients.csv',
-                  encoding='utf-8') as file:
-            reader = csv.reader(file)
-            next(reader)
-            ingredients = [
-                Ingredient(
-                    name=row[0],
-                    measurement_unit=row[1],
+    """Команда для загрузки ингредиентов в базу данных.
+
+    Файл CSV или JSON читается потоком, строки сравниваются с уже
+    загруженными по паре (название, единица измерения) и добавляются
+    пачками, поэтому повторный запуск не создает дубликатов. Ингредиенты,
+    которых нет в файле, не удаляются: на них могут ссылаться рецепты.
+    """
+
+    help = 'Загружает ингредиенты из CSV или JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--file',
+            default=os.path.join(CSV_FILES_DIR, 'ingredients.csv'),
+            help='Файл .csv, .json или .jsonl',
+        )
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Показать новые, измененные и отсутствующие в файле '
+                 'ингредиенты без записи в базу',
+        )
+
+    def read_csv(self, file):
+        """Метод, отдающий пары (название, единица) из CSV"""
+
+        for row in csv.reader(file):
+            if not row or row == HEADER:
+                continue
+            if len(row) != 2:
+                raise CommandError(f'Строка {row!r}: ожидалось два поля')
+            yield row[0], row[1]
+
+    def read_json_array(self, file):
+        """Метод, отдающий элементы JSON-массива по одному.
+
+        Файл читается кусками по CHUNK_SIZE символов, очередной элемент
+        разбирается JSONDecoder.raw_decode, как только целиком попал в
+        буфер, поэтому массив не загружается в память. Открывающая
+        скобка к этому моменту уже прочитана.
+        """
+
+        decoder = json.JSONDecoder()
+        buffer, position = '', 0
+
+        def read_more():
+            nonlocal buffer, position
+            chunk = file.read(CHUNK_SIZE)
+            buffer, position = buffer[position:] + chunk, 0
+            return bool(chunk)
+
+        def next_char():
+            nonlocal position
+            while True:
+                while (position < len(buffer)
+                       and buffer[position].isspace()):
+                    position += 1
+                if position < len(buffer):
+                    return buffer[position]
+                if not read_more():
+                    raise CommandError('Файл JSON оборван')
+
+        if next_char() == ']':
+            return
+        while True:
+            while True:
+                try:
+                    row, end = decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError:
+                    if not read_more():
+                        raise
+                    continue
+                if end < len(buffer) or not read_more():
+                    break
+            position = end
+            yield row
+            separator = next_char()
+            position += 1
+            if separator == ']':
+                return
+            if separator != ',':
+                raise CommandError(
+                    f'Файл JSON: ожидалась запятая, а не {separator!r}'
                 )
-                for row in reader
-            ]
-            Ingredient.objects.bulk_create(ingredients)
+            next_char()
+
+    def read_json(self, file):
+        """Метод, отдающий пары (название, единица) из JSON.
+
+        Массив объектов разбирается по одному элементу, JSON Lines
+        читается построчно.
+        """
+
+        first = file.read(1)
+        while first.isspace():
+            first = file.read(1)
+        if first == '[':
+            rows = self.read_json_array(file)
+        else:
+            rows = (
+                json.loads(line)
+                for line in [first + file.readline(), *file]
+                if line.strip()
+            )
+        for row in rows:
+            try:
+                yield row['name'], row['measurement_unit']
+            except (KeyError, TypeError):
+                raise CommandError(f'Запись {row!r}: нет name или '
+                                   f'measurement_unit')
+
+    def read(self, file, path):
+        if path.endswith('.csv'):
+            rows = self.read_csv(file)
+        else:
+            rows = self.read_json(file)
+        for name, unit in rows:
+            name, unit = name.strip(), unit.strip()
+            if name and unit:
+                yield name, unit
+
+    def save(self, batch):
+        Ingredient.objects.bulk_create(
+            [Ingredient(name=name, measurement_unit=unit)
+             for name, unit in batch],
+            ignore_conflicts=True,
+        )
 
     def handle(self, *args, **options):
-        self.import_ingredients_from_csv_file()
+        path, dry_run = options['file'], options['dry_run']
+        existing = set(
+            Ingredient.objects.values_list('name', 'measurement_unit')
+        )
+        units = defaultdict(list)
+        for name, unit in existing:
+            units[name].append(unit)
+        seen = set()
+        batch = []
+        added = changed = 0
+        try:
+            with open(path, encoding='utf-8') as file:
+                for key in self.read(file, path):
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                    if key in existing:
+                        continue
+                    added += 1
+                    old_units = units.get(key[0])
+                    if old_units:
+                        changed += 1
+                    if dry_run:
+                        if old_units:
+                            self.stdout.write(
+                                f'~ {key[0]}, {key[1]} '
+                                f'(в базе: {", ".join(sorted(old_units))})'
+                            )
+                        else:
+                            self.stdout.write(f'+ {key[0]}, {key[1]}')
+                        continue
+                    batch.append(key)
+                    if len(batch) >= options['batch_size']:
+                        self.save(batch)
+                        batch = []
+        except (OSError, UnicodeDecodeError, json.JSONDecodeError) as error:
+            raise CommandError(error)
+        if batch:
+            self.save(batch)
+        if added and not dry_run:
+            bump_version()
+        missing = sorted(existing - seen)
+        if dry_run:
+            for name, unit in missing:
+                self.stdout.write(f'- {name}, {unit}')
+        self.stdout.write(self.style.SUCCESS(
+            f'{"Будет добавлено" if dry_run else "Добавлено"}: {added}, '
+            f'из них с новой единицей измерения: {changed}, '
+            f'уже есть: {len(seen) - added}, '
+            f'нет в файле (не удаляются): {len(missing)}'
+        ))
@@ -0,0 +1,69 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand
+from django.db.models import Prefetch
+from recipes.models import IngredientRecipe, Recipe
+
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    """Команда для выгрузки рецептов в формате JSON Lines"""
+
+    help = 'Выгружает рецепты построчно в JSON Lines'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output', default='-',
+            help='Файл для выгрузки, по умолчанию стандартный вывод',
+        )
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def recipes(self, batch_size):
+        """Метод, отдающий рецепты пачками по возрастанию id"""
+
+        queryset = Recipe.objects.select_related('author').prefetch_related(
+            'tags',
+            Prefetch(
+                'ingredient_recipe',
+                queryset=IngredientRecipe.objects.select_related('ingredient'),
+            ),
+        ).order_by('id')
+        last_id = 0
+        while True:
+            batch = list(queryset.filter(id__gt=last_id)[:batch_size])
+            if not batch:
+                return
+            yield from batch
+            last_id = batch[-1].id
+
+    def handle(self, *args, **options):
+        output = options['output']
+        file = (sys.stdout if output == '-'
+                else open(output, 'w', encoding='utf-8'))
+        count = 0
+        try:
+            for recipe in self.recipes(options['batch_size']):
+                file.write(json.dumps({
+                    'author': recipe.author.email,
+                    'name': recipe.name,
+                    'text': recipe.text,
+                    'cooking_time': recipe.cooking_time,
+                    'image': recipe.image.name,
+                    'tags': [tag.slug for tag in recipe.tags.all()],
+                    'ingredients': [
+                        {
+                            'name': item.ingredient.name,
+                            'measurement_unit':
+                                item.ingredient.measurement_unit,
+                            'amount': item.amount,
+                        }
+                        for item in recipe.ingredient_recipe.all()
+                    ],
+                }, ensure_ascii=False) + '\n')
+                count += 1
+        finally:
+            if file is not sys.stdout:
+                file.close()
+        self.stderr.write(f'Выгружено рецептов: {count}')
@@ -0,0 +1,340 @@
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from foodgram.counts import bump_count_generation
+from recipes import counters, recipe_index, shopping_list, similarity
+from recipes.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
+                            ShoppingCart, Tag, TagRecipe)
+from recipes.search import update_search_vector
+from users.models import CustomUser, Follow
+
+BATCH_SIZE = 5000
+SKEW = 1.1
+WEIGHTED_ROUNDS = 3
+INGREDIENTS_PER_RECIPE = (3, 12)
+TAGS_PER_RECIPE = (1, 3)
+AMOUNTS = (1, 2, 3, 5, 10, 50, 100, 150, 200, 300, 500)
+FIRST_NAMES = (
+    'Анна', 'Иван', 'Мария', 'Петр', 'Ольга', 'Алексей', 'Елена',
+    'Дмитрий', 'Наталья', 'Сергей', 'Татьяна', 'Андрей',
+)
+LAST_NAMES = (
+    'Иванов', 'Смирнов', 'Кузнецов', 'Попов', 'Соколов', 'Лебедев',
+    'Козлов', 'Новиков', 'Морозов', 'Волков', 'Зайцев', 'Павлов',
+)
+DISHES = (
+    'Салат', 'Суп', 'Рагу', 'Запеканка', 'Пирог', 'Омлет', 'Паста',
+    'Каша', 'Плов', 'Пицца', 'Котлеты', 'Блины', 'Смузи', 'Соус',
+)
+STYLES = (
+    'по-домашнему', 'по-деревенски', 'на скорую руку', 'для праздника',
+    'на завтрак', 'в духовке', 'на сковороде', 'в мультиварке',
+)
+
+
+def cumulative_weights(size, exponent):
+    """Функция для накопленных весов распределения Ципфа.
+
+    Элемент с рангом r выбирается с вероятностью, пропорциональной
+    r ** -exponent, поэтому несколько первых элементов популярны,
+    а у остальных длинный хвост.
+    """
+
+    weights = []
+    total = 0.0
+    for rank in range(1, size + 1):
+        total += rank ** -exponent
+        weights.append(total)
+    return weights
+
+
+def allocate(rng, total, size, exponent):
+    """Функция для распределения total связей между size участниками.
+
+    Активность участников тоже следует закону Ципфа. Дробная часть
+    доли округляется случайно, поэтому сумма в среднем равна total.
+    """
+
+    weights = [rank ** -exponent for rank in range(1, size + 1)]
+    scale = total / sum(weights)
+    counts = []
+    for weight in weights:
+        share = weight * scale
+        counts.append(int(share) + (rng.random() < share % 1))
+    return counts
+
+
+def pick(rng, population, weights, count, exclude=None):
+    """Функция для выбора count разных элементов с учетом популярности.
+
+    Несколько раундов выбирают элементы по весам. Если редкие
+    элементы хвоста не набрались, остаток добирается равномерно,
+    чтобы выбор не затягивался.
+    """
+
+    count = min(count, len(population) - (exclude is not None))
+    if count <= 0:
+        return set()
+    if count > len(population) // 2:
+        candidates = [item for item in population if item != exclude]
+        return set(rng.sample(candidates, min(count, len(candidates))))
+    chosen = set()
+    for _ in range(WEIGHTED_ROUNDS):
+        chosen.update(rng.choices(
+            population, cum_weights=weights, k=count - len(chosen)
+        ))
+        chosen.discard(exclude)
+        if len(chosen) >= count:
+            break
+    while len(chosen) < count:
+        item = rng.choice(population)
+        if item != exclude:
+            chosen.add(item)
+    return chosen
+
+
+class Command(BaseCommand):
+    """Команда для наполнения базы синтетическими данными.
+
+    Создает пользователей, рецепты с ингредиентами и тегами,
+    избранное, корзины и подписки. Популярность рецептов и авторов и
+    активность пользователей следуют закону Ципфа с показателем
+    --skew, поэтому данные похожи на настоящие: немного очень
+    популярных рецептов и длинный хвост. Генератор случайных чисел
+    инициализируется --seed, и на одинаковой базе повторный запуск
+    дает одинаковые данные. Записи создаются пачками через
+    bulk_create без сигналов, а индекс ингредиентов, счетчики и
+    списки покупок пересчитываются в конце.
+    """
+
+    help = 'Создает синтетических пользователей, рецепты и связи'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=10000)
+        parser.add_argument('--favorites', type=int, default=100000)
+        parser.add_argument('--carts', type=int, default=10000)
+        parser.add_argument('--follows', type=int, default=20000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--skew', type=float, default=SKEW)
+        parser.add_argument('--days', type=int, default=365,
+                            help='За сколько дней распределить рецепты')
+        parser.add_argument('--password', default='foodgram',
+                            help='Пароль всех созданных пользователей')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def progress(self, label, done, total):
+        elapsed = time.monotonic() - self.started
+        self.stderr.write(f'{label}: {done} из {total}, {elapsed:.0f} с')
+
+    def create_users(self, total):
+        """Метод для создания пользователей, возвращает их id"""
+
+        start = (CustomUser.objects.aggregate(Max('id'))['id__max'] or 0) + 1
+        password = make_password(self.options['password'])
+        user_ids = []
+        for offset in range(0, total, self.batch_size):
+            batch = []
+            for number in range(start + offset,
+                                start + min(offset + self.batch_size, total)):
+                batch.append(CustomUser(
+                    email=f'fake{number}@example.com',
+                    username=f'fake{number}',
+                    first_name=self.rng.choice(FIRST_NAMES),
+                    last_name=self.rng.choice(LAST_NAMES),
+                    password=password,
+                ))
+            user_ids.extend(
+                user.id for user in CustomUser.objects.bulk_create(batch)
+            )
+            self.progress('Пользователи', len(user_ids), total)
+        return user_ids
+
+    def build_recipe(self, author_id, created):
+        """Метод для подготовки рецепта, его ингредиентов и тегов"""
+
+        ingredient_ids = pick(
+            self.rng, self.ingredient_ids, self.ingredient_weights,
+            self.rng.randint(*INGREDIENTS_PER_RECIPE),
+        )
+        tag_ids = set(self.rng.sample(
+            self.tag_ids,
+            min(self.rng.randint(*TAGS_PER_RECIPE), len(self.tag_ids)),
+        ))
+        names = [self.ingredient_names[pk] for pk in ingredient_ids]
+        recipe = Recipe(
+            author_id=author_id,
+            name=(f'{self.rng.choice(DISHES)} {self.rng.choice(STYLES)} '
+                  f'({names[0]})')[:200],
+            text=f'Понадобится: {", ".join(names)}. Смешать и подать.',
+            cooking_time=max(1, round(self.rng.lognormvariate(3.4, 0.6))),
+            created=created,
+        )
+        amounts = {pk: self.rng.choice(AMOUNTS) for pk in ingredient_ids}
+        return recipe, amounts, tag_ids
+
+    def save_recipes(self, items):
+        """Метод для записи пачки рецептов и обновления индексов.
+
+        Вызывается внутри транзакции, поэтому пачка пишется целиком.
+        bulk_create заполняет created текущим временем (auto_now_add),
+        поэтому даты публикации записываются следом через bulk_update.
+        """
+
+        created = [recipe.created for recipe, _, _ in items]
+        recipes = Recipe.objects.bulk_create(
+            [recipe for recipe, _, _ in items]
+        )
+        for recipe, value in zip(recipes, created):
+            recipe.created = value
+        Recipe.objects.bulk_update(
+            recipes, ('created',), batch_size=self.batch_size
+        )
+        ingredient_recipes = []
+        tag_recipes = []
+        for recipe, (_, amounts, tag_ids) in zip(recipes, items):
+            for ingredient_id, amount in amounts.items():
+                ingredient_recipes.append(IngredientRecipe(
+                    recipe_id=recipe.id,
+                    ingredient_id=ingredient_id,
+                    amount=amount,
+                ))
+            tag_recipes.extend(
+                TagRecipe(recipe_id=recipe.id, tag_id=tag_id)
+                for tag_id in tag_ids
+            )
+        IngredientRecipe.objects.bulk_create(
+            ingredient_recipes, batch_size=self.batch_size
+        )
+        TagRecipe.objects.bulk_create(tag_recipes, batch_size=self.batch_size)
+        similarity.index_recipes(
+            (recipe.id, amounts.keys(), tag_ids)
+            for recipe, (_, amounts, tag_ids) in zip(recipes, items)
+        )
+        update_search_vector(Recipe.objects.filter(
+            id__in=[recipe.id for recipe in recipes]
+        ))
+        return [recipe.id for recipe in recipes]
+
+    def create_recipes(self, total):
+        """Метод для создания рецептов, возвращает их id.
+
+        Авторы выбираются по популярности, даты публикации растут
+        вместе с id и равномерно покрывают последние --days дней.
+        """
+
+        authors = self.rng.choices(
+            self.authors, cum_weights=self.author_weights, k=total
+        )
+        period = timedelta(days=self.options['days'])
+        first = timezone.now() - period
+        recipe_ids = []
+        items = []
+        for number, author_id in enumerate(authors):
+            created = first + period * (number + self.rng.random()) / total
+            items.append(self.build_recipe(author_id, created))
+            if len(items) >= self.batch_size:
+                with transaction.atomic():
+                    recipe_ids.extend(self.save_recipes(items))
+                items = []
+                self.progress('Рецепты', len(recipe_ids), total)
+        if items:
+            with transaction.atomic():
+                recipe_ids.extend(self.save_recipes(items))
+            self.progress('Рецепты', len(recipe_ids), total)
+        return recipe_ids
+
+    def create_links(self, model, field, total, user_ids, targets, weights):
+        """Метод для создания связей пользователей с рецептами или авторами.
+
+        Число связей пользователя задается его активностью, цели
+        выбираются по популярности без повторов, поэтому уникальные
+        ограничения моделей не нарушаются.
+        """
+
+        users = user_ids[:]
+        self.rng.shuffle(users)
+        counts = allocate(self.rng, total, len(users), self.options['skew'])
+        created = 0
+        batch = []
+        for user_id, count in zip(users, counts):
+            exclude = user_id if model is Follow else None
+            for target in pick(self.rng, targets, weights, count, exclude):
+                batch.append(model(user_id=user_id, **{field: target}))
+            if len(batch) >= self.batch_size:
+                model.objects.bulk_create(batch)
+                created += len(batch)
+                batch = []
+                self.progress(model._meta.verbose_name_plural, created, total)
+        model.objects.bulk_create(batch)
+        created += len(batch)
+        return created
+
+    def popularity(self, items):
+        """Метод для случайного порядка популярности элементов"""
+
+        items = items[:]
+        self.rng.shuffle(items)
+        return items, cumulative_weights(len(items), self.options['skew'])
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.started = time.monotonic()
+        self.ingredient_names = dict(
+            Ingredient.objects.order_by('id').values_list('id', 'name')
+        )
+        self.tag_ids = list(
+            Tag.objects.order_by('id').values_list('id', flat=True)
+        )
+        if not self.ingredient_names or not self.tag_ids:
+            raise CommandError(
+                'Нужны ингредиенты и теги: сначала выполните '
+                'add_ingredients_from_data и создайте теги'
+            )
+        if options['users'] < 1:
+            raise CommandError('Нужен хотя бы один пользователь')
+        self.ingredient_ids, self.ingredient_weights = self.popularity(
+            list(self.ingredient_names)
+        )
+
+        user_ids = self.create_users(options['users'])
+        self.authors, self.author_weights = self.popularity(user_ids)
+        recipe_ids = self.create_recipes(options['recipes'])
+        totals = {'пользователей': len(user_ids), 'рецептов': len(recipe_ids)}
+        with transaction.atomic():
+            totals['подписок'] = self.create_links(
+                Follow, 'author_id', options['follows'], user_ids,
+                self.authors, self.author_weights,
+            )
+        if recipe_ids:
+            recipes, weights = self.popularity(recipe_ids)
+            with transaction.atomic():
+                totals['в избранном'] = self.create_links(
+                    Favorite, 'recipe_id', options['favorites'], user_ids,
+                    recipes, weights,
+                )
+            with transaction.atomic():
+                totals['в корзинах'] = self.create_links(
+                    ShoppingCart, 'recipe_id', options['carts'], user_ids,
+                    recipes, weights,
+                )
+
+        self.stderr.write('Пересчет счетчиков, индекса и списков покупок')
+        counters.recount()
+        recipe_index.rebuild()
+        shopping_list.rebuild()
+        bump_count_generation('recipes')
+        bump_count_generation('users')
+        elapsed = time.monotonic() - self.started
+        self.stdout.write(self.style.SUCCESS(
+            ', '.join(f'{label}: {total}' for label, total in totals.items())
+            + f' за {elapsed:.1f} с'
+        ))
@@ -0,0 +1,188 @@
+import json
+import sys
+import time
+from collections import Counter, defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from foodgram.counts import bump_count_generation
+from recipes import counters, recipe_index, similarity
+from recipes.models import Ingredient, IngredientRecipe, Recipe, Tag, TagRecipe
+from recipes.search import update_search_vector
+from users.models import CustomUser
+
+BATCH_SIZE = 1000
+SMALL_INTEGER_MAX = 32767
+
+
+def positive_int(value, field):
+    """Функция для проверки целого числа от 1 до SMALL_INTEGER_MAX.
+
+    Принимает int или строку из цифр, дробные числа и bool отклоняются,
+    чтобы не отрезать дробную часть молча.
+    """
+
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise ValueError(f'{field}: ожидалось целое число, {value!r}')
+    number = int(value)
+    if not 1 <= number <= SMALL_INTEGER_MAX:
+        raise ValueError(
+            f'{field}: ожидалось от 1 до {SMALL_INTEGER_MAX}, {number}'
+        )
+    return number
+
+
+class Command(BaseCommand):
+    """Команда для загрузки рецептов из файла JSON Lines.
+
+    Каждая строка - рецепт в формате команды export_recipes. Файл
+    читается построчно, рецепты записываются пачками через bulk_create,
+    каждая пачка - в своей транзакции, поэтому память не зависит от
+    размера файла.
+    """
+
+    help = 'Загружает рецепты из JSON Lines пачками'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'file', help='Файл JSON Lines, "-" для стандартного ввода'
+        )
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def load_catalog(self):
+        """Метод для загрузки справочников тегов и ингредиентов"""
+
+        self.tags = dict(Tag.objects.values_list('slug', 'id'))
+        self.ingredients = {
+            (name, unit): pk for pk, name, unit in
+            Ingredient.objects.values_list(
+                'id', 'name', 'measurement_unit'
+            ).iterator()
+        }
+
+    def build(self, line_number, data, authors):
+        """Метод для подготовки рецепта, его ингредиентов и тегов"""
+
+        try:
+            author_id = authors[data['author']]
+            tag_ids = {self.tags[slug] for slug in data['tags']}
+            amounts = {}
+            for item in data['ingredients']:
+                key = (item['name'], item['measurement_unit'])
+                amounts[self.ingredients[key]] = positive_int(
+                    item['amount'], 'amount'
+                )
+            recipe = Recipe(
+                author_id=author_id,
+                name=data['name'],
+                text=data['text'],
+                cooking_time=positive_int(
+                    data['cooking_time'], 'cooking_time'
+                ),
+                image=data.get('image', ''),
+            )
+        except (KeyError, TypeError, ValueError) as error:
+            self.stderr.write(f'Строка {line_number}: пропущена ({error!r})')
+            return None
+        if len(amounts) != len(data['ingredients']):
+            self.stderr.write(
+                f'Строка {line_number}: пропущена (повтор ингредиента)'
+            )
+            return None
+        return recipe, amounts, tag_ids
+
+    def save_batch(self, batch):
+        """Метод для записи пачки рецептов в одной транзакции"""
+
+        authors = dict(CustomUser.objects.filter(
+            email__in={data.get('author') for _, data in batch}
+        ).values_list('email', 'id'))
+        items = [self.build(number, data, authors) for number, data in batch]
+        items = [item for item in items if item is not None]
+        if not items:
+            return 0
+        with transaction.atomic():
+            recipes = Recipe.objects.bulk_create(
+                [recipe for recipe, _, _ in items]
+            )
+            ingredient_recipes = []
+            tag_recipes = []
+            postings = defaultdict(list)
+            for recipe, (_, amounts, tag_ids) in zip(recipes, items):
+                for ingredient_id, amount in amounts.items():
+                    ingredient_recipes.append(IngredientRecipe(
+                        recipe_id=recipe.id,
+                        ingredient_id=ingredient_id,
+                        amount=amount,
+                    ))
+                    postings[ingredient_id].append(recipe.id)
+                tag_recipes.extend(
+                    TagRecipe(recipe_id=recipe.id, tag_id=tag_id)
+                    for tag_id in tag_ids
+                )
+            IngredientRecipe.objects.bulk_create(ingredient_recipes)
+            TagRecipe.objects.bulk_create(tag_recipes)
+            recipe_index.add_recipes(postings)
+            similarity.index_recipes(
+                (recipe.id, amounts.keys(), tag_ids)
+                for recipe, (_, amounts, tag_ids) in zip(recipes, items)
+            )
+            update_search_vector(
+                Recipe.objects.filter(id__in=[recipe.id for recipe in recipes])
+            )
+            authors = Counter(recipe.author_id for recipe in recipes)
+            for author_id, total in authors.items():
+                counters.change(
+                    CustomUser, (author_id,), 'recipes_count', total
+                )
+        return len(recipes)
+
+    def read(self, file, batch_size):
+        """Метод, отдающий строки файла пачками"""
+
+        batch = []
+        for line_number, line in enumerate(file, start=1):
+            if not line.strip():
+                continue
+            try:
+                data = json.loads(line)
+            except json.JSONDecodeError as error:
+                self.stderr.write(f'Строка {line_number}: {error}')
+                continue
+            if not isinstance(data, dict):
+                self.stderr.write(f'Строка {line_number}: ожидался объект')
+                continue
+            batch.append((line_number, data))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def handle(self, *args, **options):
+        self.load_catalog()
+        try:
+            file = (sys.stdin if options['file'] == '-'
+                    else open(options['file'], encoding='utf-8'))
+        except OSError as error:
+            raise CommandError(error)
+        started = time.monotonic()
+        total = 0
+        try:
+            for batch in self.read(file, options['batch_size']):
+                total += self.save_batch(batch)
+                elapsed = time.monotonic() - started
+                self.stderr.write(
+                    f'Загружено {total} рецептов, '
+                    f'{total / elapsed:.0f} рецептов/с'
+                )
+        finally:
+            if file is not sys.stdin:
+                file.close()
+            if total:
+                bump_count_generation('recipes')
+                bump_count_generation('users')
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено {total} рецептов за {elapsed:.1f} с'
+        ))
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+from recipes.models import Recipe
+from recipes.tasks import refresh_renditions
+
+BATCH_SIZE = 500
+
+
+class Command(BaseCommand):
+    """Команда для создания уменьшенных копий фото рецептов"""
+
+    help = 'Создает копии фото WebP и JPEG для рецептов, у которых их нет'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Пересоздать копии для всех рецептов',
+        )
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.exclude(image='').only(
+            'id', 'image', 'image_renditions'
+        ).order_by('id')
+        last_id = 0
+        done = 0
+        while True:
+            batch = list(recipes.filter(id__gt=last_id)[:BATCH_SIZE])
+            if not batch:
+                break
+            last_id = batch[-1].id
+            for recipe in batch:
+                if options['force']:
+                    recipe.image_renditions = {}
+                source = recipe.image_renditions.get('source')
+                refresh_renditions(recipe)
+                if source != recipe.image_renditions.get('source'):
+                    done += 1
+            self.stderr.write(f'Обработано до рецепта {last_id}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Копии фото созданы для {done} рецептов'
+        ))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from recipes import recipe_index
+
+
+class Command(BaseCommand):
+    """Команда для пересоздания индекса рецептов по ингредиентам"""
+
+    help = 'Пересоздает обратный индекс ингредиент - рецепты'
+
+    def handle(self, *args, **options):
+        recipe_index.rebuild()
+        self.stdout.write(self.style.SUCCESS('Индекс пересоздан'))
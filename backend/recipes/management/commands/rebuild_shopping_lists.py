@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+from recipes import shopping_list
+
+
+class Command(BaseCommand):
+    """Команда для пересоздания или проверки списков покупок"""
+
+    help = 'Пересоздает таблицу списков покупок по корзинам пользователей'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Только сравнить таблицу с корзинами, ничего не меняя',
+        )
+
+    def handle(self, *args, **options):
+        if not options['verify']:
+            shopping_list.rebuild()
+            self.stdout.write(self.style.SUCCESS('Списки покупок пересозданы'))
+            return
+        mismatches = shopping_list.verify()
+        for (user_id, ingredient_id), (actual, expected) in sorted(
+            mismatches.items()
+        ):
+            self.stdout.write(
+                f'user={user_id} ingredient={ingredient_id}: '
+                f'в таблице {actual}, по корзинам {expected}'
+            )
+        if mismatches:
+            raise CommandError(f'Найдено расхождений: {len(mismatches)}')
+        self.stdout.write(self.style.SUCCESS('Расхождений не найдено'))
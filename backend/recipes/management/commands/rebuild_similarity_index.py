@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from recipes import similarity
+
+
+class Command(BaseCommand):
+    """Команда для пересоздания индекса похожих рецептов"""
+
+    help = 'Пересоздает MinHash-сигнатуры и корзины LSH для всех рецептов'
+
+    def handle(self, *args, **options):
+        similarity.rebuild()
+        self.stdout.write(
+            self.style.SUCCESS('Индекс похожих рецептов пересоздан')
+        )
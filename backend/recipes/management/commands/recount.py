@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from recipes import counters
+
+
+class Command(BaseCommand):
+    """Команда для исправления счетчиков рецептов и пользователей"""
+
+    help = ('Пересчитывает счетчики избранного, корзин, рецептов '
+            'и подписок там, где они разошлись с данными')
+
+    def handle(self, *args, **options):
+        fixed = counters.recount()
+        self.stdout.write(self.style.SUCCESS(
+            f'Исправлено рецептов: {fixed["recipes"]}, '
+            f'пользователей: {fixed["users"]}'
+        ))
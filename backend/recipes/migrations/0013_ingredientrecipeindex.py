@@ -0,0 +1,45 @@
+# Generated by Django 4.2.5 on 2026-10-18 02:07
+
+from django.db import migrations, models
+import django.db.models.deletion
+from array import array
+
+
+def fill_index(apps, schema_editor):
+    IngredientRecipe = apps.get_model('recipes', 'IngredientRecipe')
+    IngredientRecipeIndex = apps.get_model('recipes', 'IngredientRecipeIndex')
+    postings = {}
+    for ingredient_id, recipe_id in IngredientRecipe.objects.order_by(
+        'recipe_id'
+    ).values_list('ingredient_id', 'recipe_id').iterator():
+        postings.setdefault(ingredient_id, array('Q')).append(recipe_id)
+    IngredientRecipeIndex.objects.bulk_create(
+        [
+            IngredientRecipeIndex(ingredient_id=ingredient_id,
+                                  recipe_ids=ids.tobytes())
+            for ingredient_id, ids in postings.items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0012_recipe_search_vector'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngredientRecipeIndex',
+            fields=[
+                ('ingredient', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='recipe_index', serialize=False, to='recipes.ingredient', verbose_name='ингредиент')),
+                ('recipe_ids', models.BinaryField(default=bytes, verbose_name='id рецептов')),
+            ],
+            options={
+                'verbose_name': 'Рецепты с ингредиентом',
+                'verbose_name_plural': 'Индекс рецептов по ингредиентам',
+            },
+        ),
+        migrations.RunPython(fill_index, migrations.RunPython.noop),
+    ]
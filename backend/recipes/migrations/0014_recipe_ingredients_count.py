@@ -0,0 +1,33 @@
+# Generated by Django 4.2.5 on 2026-10-18 02:08
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def fill_ingredients_count(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    IngredientRecipe = apps.get_model('recipes', 'IngredientRecipe')
+    Recipe.objects.update(ingredients_count=Coalesce(models.Subquery(
+        IngredientRecipe.objects.filter(
+            recipe=models.OuterRef('pk')
+        ).order_by().values('recipe').annotate(
+            total=models.Count('id')
+        ).values('total')[:1]
+    ), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0013_ingredientrecipeindex'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='ingredients_count',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, verbose_name='количество ингредиентов'),
+        ),
+        migrations.RunPython(fill_ingredients_count,
+                             migrations.RunPython.noop),
+    ]
@@ -0,0 +1,84 @@
+# Generated by Django 4.2.5 on 2026-10-18 02:12
+
+from array import array
+
+from django.db import migrations, models
+
+
+def merge_rows(model, field, duplicate_id, keep_id, amount_field):
+    for row in model.objects.filter(ingredient_id=duplicate_id):
+        existing = model.objects.filter(
+            **{field: getattr(row, field)}, ingredient_id=keep_id
+        ).first()
+        if existing is None:
+            row.ingredient_id = keep_id
+            row.save(update_fields=('ingredient',))
+            continue
+        setattr(existing, amount_field,
+                getattr(existing, amount_field) + getattr(row, amount_field))
+        existing.save(update_fields=(amount_field,))
+        row.delete()
+
+
+def merge_duplicates(apps, schema_editor):
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    IngredientRecipe = apps.get_model('recipes', 'IngredientRecipe')
+    IngredientRecipeIndex = apps.get_model('recipes', 'IngredientRecipeIndex')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    ShoppingListItem = apps.get_model('recipes', 'ShoppingListItem')
+    groups = Ingredient.objects.values('name', 'measurement_unit').annotate(
+        keep_id=models.Min('id'), total=models.Count('id')
+    ).filter(total__gt=1).order_by()
+    for group in groups:
+        keep_id = group['keep_id']
+        duplicate_ids = list(Ingredient.objects.filter(
+            name=group['name'], measurement_unit=group['measurement_unit']
+        ).exclude(id=keep_id).values_list('id', flat=True))
+        for duplicate_id in duplicate_ids:
+            merge_rows(IngredientRecipe, 'recipe_id', duplicate_id, keep_id,
+                       'amount')
+            merge_rows(ShoppingListItem, 'user_id', duplicate_id, keep_id,
+                       'total_amount')
+        recipe_ids = set()
+        for row in IngredientRecipeIndex.objects.filter(
+            ingredient_id__in=[keep_id, *duplicate_ids]
+        ):
+            ids = array('Q')
+            ids.frombytes(bytes(row.recipe_ids))
+            recipe_ids.update(ids)
+        IngredientRecipeIndex.objects.filter(
+            ingredient_id__in=duplicate_ids
+        ).delete()
+        if recipe_ids:
+            IngredientRecipeIndex.objects.update_or_create(
+                ingredient_id=keep_id,
+                defaults={
+                    'recipe_ids': array('Q', sorted(recipe_ids)).tobytes()
+                },
+            )
+        Ingredient.objects.filter(id__in=duplicate_ids).delete()
+        for recipe in Recipe.objects.filter(
+            id__in=IngredientRecipe.objects.filter(
+                ingredient_id=keep_id
+            ).values('recipe_id')
+        ).annotate(
+            total=models.Count('ingredient_recipe')
+        ):
+            Recipe.objects.filter(id=recipe.id).update(
+                ingredients_count=recipe.total
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0015_recipe_similarity'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(fields=('name', 'measurement_unit'), name='unique_ingredient'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.5 on 2026-10-18 03:40
+
+from django.db import migrations
+
+
+def create_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        'CREATE VIRTUAL TABLE recipes_recipe_fts USING fts5(name, text)'
+    )
+    schema_editor.execute(
+        'INSERT INTO recipes_recipe_fts(rowid, name, text) '
+        'SELECT id, name, text FROM recipes_recipe'
+    )
+
+
+def drop_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute('DROP TABLE IF EXISTS recipes_recipe_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0018_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts_table, drop_fts_table),
+    ]
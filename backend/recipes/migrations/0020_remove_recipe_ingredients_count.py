@@ -0,0 +1,17 @@
+# Generated by Django 4.2.5 on 2026-10-18 04:10
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0019_recipe_search_fts'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='recipe',
+            name='ingredients_count',
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.5 on 2026-10-18 03:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0020_remove_recipe_ingredients_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngredientRecipeIndexChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ingredient_id', models.PositiveBigIntegerField(verbose_name='id ингредиента')),
+                ('recipe_id', models.PositiveBigIntegerField(verbose_name='id рецепта')),
+            ],
+            options={
+                'verbose_name': 'Изменение индекса рецептов',
+                'verbose_name_plural': 'Очередь изменений индекса рецептов',
+            },
+        ),
+    ]
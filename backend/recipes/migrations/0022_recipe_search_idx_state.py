@@ -0,0 +1,26 @@
+# Generated by Django 4.2.5 on 2026-10-18 05:40
+
+import django.contrib.postgres.indexes
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0021_ingredientrecipeindexchange'),
+    ]
+
+    # Индекс recipe_search_idx создан в 0012 и только на PostgreSQL,
+    # поэтому здесь меняется лишь состояние модели
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddIndex(
+                    model_name='recipe',
+                    index=django.contrib.postgres.indexes.GinIndex(
+                        fields=['search_vector'], name='recipe_search_idx'
+                    ),
+                ),
+            ],
+        ),
+    ]
@@ -1,3 +1,5 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator, RegexValidator
 from django.db import models
 from users.models import CustomUser
@@ -59,6 +61,12 @@ class Ingredient(models.Model):
         ordering = ('name',)
         verbose_name = 'ингридиент'
         verbose_name_plural = 'ингридиенты'
+        constraints = (
+            models.UniqueConstraint(
+                fields=['name', 'measurement_unit'],
+                name='unique_ingredient'
+            ),
+        )
 
     def __str__(self):
         return f"{self.name}, {self.measurement_unit}."
@@ -82,6 +90,12 @@ class Recipe(models.Model):
         blank=True,
         verbose_name='фото рецепта',
     )
+    image_renditions = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name='уменьшенные копии фото',
+    )
     text = models.TextField(
         verbose_name='описание рецепта',
     )
@@ -107,15 +121,47 @@ class Recipe(models.Model):
         auto_now_add=True,
         verbose_name='дата публикации рецепта',
     )
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='в избранном',
+    )
+    carts_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='в списках покупок',
+    )
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+        verbose_name='поисковый вектор',
+    )
 
     class Meta:
         verbose_name = "рецепт"
         verbose_name_plural = "рецепты"
         ordering = ("-created",)
+        indexes = (
+            models.Index(fields=('-created', '-id'), name='recipe_feed_idx'),
+            GinIndex(fields=('search_vector',), name='recipe_search_idx'),
+        )
 
     def __str__(self):
         return f"{self.name}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Запоминаем загруженные название и описание.
+
+        По ним сигнал recipe_saved определяет, нужно ли пересчитывать
+        поисковый вектор.
+        """
+
+        instance = super().from_db(db, field_names, values)
+        if not {'name', 'text'} & instance.get_deferred_fields():
+            instance.indexed_text = (instance.name, instance.text)
+        return instance
+
 
 class TagRecipe(models.Model):
     """Вспомогательный модель для описания тегов в рецептах"""
@@ -243,3 +289,138 @@ class ShoppingCart(models.Model):
 
     def __str__(self):
         return f'{self.recipe} в списке покупок у {self.user}'
+
+
+class ShoppingListItem(models.Model):
+    """Модель для хранения итогового списка покупок пользователя.
+
+    Таблица поддерживается при изменении корзины и рецептов в ней,
+    поэтому выгрузка списка покупок не требует агрегации.
+    """
+
+    user = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+        verbose_name='пользователь'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+        verbose_name='ингредиент'
+    )
+    total_amount = models.PositiveIntegerField(
+        verbose_name='общее количество',
+    )
+
+    class Meta:
+        verbose_name = 'Ингредиент в списке покупок'
+        verbose_name_plural = 'Ингредиенты в списках покупок'
+        constraints = (
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique_shopping_list_item'
+            ),
+        )
+
+    def __str__(self):
+        return (f'{self.ingredient} {self.total_amount} '
+                f'в списке покупок у {self.user}')
+
+
+class IngredientRecipeIndex(models.Model):
+    """Модель обратного индекса: ингредиент и рецепты с ним.
+
+    recipe_ids хранит отсортированный массив id рецептов
+    (беззнаковые 64-битные числа), индекс поддерживается при
+    создании, изменении и удалении рецептов.
+    """
+
+    ingredient = models.OneToOneField(
+        Ingredient,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='recipe_index',
+        verbose_name='ингредиент'
+    )
+    recipe_ids = models.BinaryField(
+        default=bytes,
+        verbose_name='id рецептов',
+    )
+
+    class Meta:
+        verbose_name = 'Рецепты с ингредиентом'
+        verbose_name_plural = 'Индекс рецептов по ингредиентам'
+
+    def __str__(self):
+        return f'Рецепты с ингредиентом {self.ingredient}'
+
+
+class IngredientRecipeIndexChange(models.Model):
+    """Модель очереди изменений индекса рецептов по ингредиентам.
+
+    Каждая строка - пара ингредиент и рецепт, которую нужно сверить
+    с IngredientRecipe и перенести в IngredientRecipeIndex. Поля не
+    внешние ключи: после удаления рецепта или ингредиента пара должна
+    остаться в очереди.
+    """
+
+    ingredient_id = models.PositiveBigIntegerField(
+        verbose_name='id ингредиента'
+    )
+    recipe_id = models.PositiveBigIntegerField(verbose_name='id рецепта')
+
+    class Meta:
+        verbose_name = 'Изменение индекса рецептов'
+        verbose_name_plural = 'Очередь изменений индекса рецептов'
+
+    def __str__(self):
+        return f'Рецепт {self.recipe_id} и ингредиент {self.ingredient_id}'
+
+
+class RecipeSignature(models.Model):
+    """Модель для хранения MinHash-сигнатуры рецепта.
+
+    Сигнатура строится по множеству ингредиентов и тегов рецепта
+    и используется для оценки сходства рецептов.
+    """
+
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='signature',
+        verbose_name='рецепт'
+    )
+    signature = models.BinaryField(verbose_name='сигнатура')
+
+    class Meta:
+        verbose_name = 'Сигнатура рецепта'
+        verbose_name_plural = 'Сигнатуры рецептов'
+
+    def __str__(self):
+        return f'Сигнатура рецепта {self.recipe_id}'
+
+
+class RecipeBucket(models.Model):
+    """Модель для корзин LSH: рецепты с совпадающей полосой сигнатуры"""
+
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='buckets',
+        verbose_name='рецепт'
+    )
+    band = models.PositiveSmallIntegerField(verbose_name='полоса')
+    hash = models.BigIntegerField(verbose_name='хэш полосы')
+
+    class Meta:
+        verbose_name = 'Корзина LSH'
+        verbose_name_plural = 'Корзины LSH'
+        indexes = (
+            models.Index(fields=('band', 'hash'), name='recipe_bucket_idx'),
+        )
+
+    def __str__(self):
+        return f'Рецепт {self.recipe_id} в корзине {self.band}:{self.hash}'
@@ -0,0 +1,373 @@
+import threading
+import time
+from array import array
+from collections import OrderedDict, defaultdict
+from functools import reduce
+
+import numpy as np
+from django.db import connection, transaction
+from django.db.models import F, Lookup, Q
+from jobs.queue import enqueue, task
+
+from . import catalog
+from .models import (Ingredient, IngredientRecipe, IngredientRecipeIndex,
+                     IngredientRecipeIndexChange)
+
+BATCH_SIZE = 1000
+CHANGES_BATCH = 10000
+VERSION_KEY = 'recipe_index_version'
+CHECK_INTERVAL = 5
+RANKING_CACHE_SIZE = 32
+EMPTY = np.empty(0, dtype=np.int64)
+
+
+def decode(value):
+    """Функция для чтения массива id рецептов из поля индекса"""
+
+    return np.frombuffer(bytes(value), dtype=np.int64)
+
+
+def version_changed():
+    catalog.bump_version(VERSION_KEY)
+    index.invalidate()
+
+
+def bump_version():
+    """Функция для смены версии индекса после фиксации транзакции"""
+
+    transaction.on_commit(version_changed)
+
+
+def queue_changes(pairs):
+    """Функция для записи пар (id ингредиента, id рецепта) в очередь.
+
+    Пары записываются обычными INSERT в IngredientRecipeIndexChange,
+    строки индекса меняет пачкой задача apply_changes. Поэтому запись
+    рецепта не блокирует и не переписывает строки популярных
+    ингредиентов, а в очереди одновременно ждет одна задача.
+    """
+
+    changes = [
+        IngredientRecipeIndexChange(ingredient_id=ingredient_id,
+                                    recipe_id=recipe_id)
+        for ingredient_id, recipe_id in pairs
+    ]
+    if not changes:
+        return
+    IngredientRecipeIndexChange.objects.bulk_create(
+        changes, batch_size=BATCH_SIZE
+    )
+    enqueue(apply_changes, unique=True)
+
+
+def update_index(recipe_id, added=(), removed=()):
+    """Функция для изменения индекса при изменении рецепта.
+
+    added и removed - id ингредиентов, которые появились в рецепте
+    или были из него удалены.
+    """
+
+    queue_changes(
+        (pk, recipe_id) for pk in set(added) | set(removed)
+    )
+
+
+def add_recipes(postings):
+    """Функция для добавления в индекс пачки новых рецептов.
+
+    postings - словарь {id ингредиента: список id рецептов с ним}.
+    """
+
+    queue_changes(
+        (pk, recipe_id)
+        for pk, recipe_ids in postings.items()
+        for recipe_id in recipe_ids
+    )
+
+
+@task
+def apply_changes():
+    """Задача для переноса очереди изменений в строки индекса.
+
+    Берет до CHANGES_BATCH пар, блокирует строки индекса их
+    ингредиентов и сверяет пары с IngredientRecipe: пара есть в
+    таблице - рецепт добавляется в массив, нет - удаляется. Пары
+    удаленных ингредиентов пропускаются. Каждая
+    строка индекса переписывается один раз на пачку, порядок
+    изменений не важен. Если очередь не опустела, ставит себя снова.
+    """
+
+    with transaction.atomic():
+        changes = list(
+            IngredientRecipeIndexChange.objects.select_for_update(
+                skip_locked=True
+            ).order_by('id').values_list(
+                'id', 'ingredient_id', 'recipe_id'
+            )[:CHANGES_BATCH]
+        )
+        if not changes:
+            return
+        ingredient_ids = set(Ingredient.objects.filter(
+            id__in={pk for _, pk, _ in changes}
+        ).values_list('id', flat=True))
+        pairs = {
+            (pk, recipe_id) for _, pk, recipe_id in changes
+            if pk in ingredient_ids
+        }
+        IngredientRecipeIndex.objects.bulk_create(
+            [IngredientRecipeIndex(ingredient_id=pk) for pk in ingredient_ids],
+            ignore_conflicts=True,
+        )
+        rows = list(IngredientRecipeIndex.objects.select_for_update().filter(
+            ingredient_id__in=ingredient_ids
+        ).order_by('ingredient_id'))
+        present = set(IngredientRecipe.objects.filter(
+            ingredient_id__in=ingredient_ids,
+            recipe_id__in={recipe_id for _, recipe_id in pairs},
+        ).values_list('ingredient_id', 'recipe_id'))
+        added, removed = defaultdict(list), defaultdict(list)
+        for pair in pairs:
+            target = added if pair in present else removed
+            target[pair[0]].append(pair[1])
+        for row in rows:
+            ids = np.setdiff1d(decode(row.recipe_ids), np.array(
+                removed[row.ingredient_id], dtype=np.int64
+            ))
+            ids = np.union1d(ids, np.array(
+                added[row.ingredient_id], dtype=np.int64
+            ))
+            row.recipe_ids = ids.tobytes()
+        IngredientRecipeIndex.objects.bulk_update(
+            rows, ('recipe_ids',), batch_size=BATCH_SIZE
+        )
+        IngredientRecipeIndexChange.objects.filter(
+            id__in=[pk for pk, _, _ in changes]
+        ).delete()
+        bump_version()
+    if len(changes) == CHANGES_BATCH:
+        enqueue(apply_changes, unique=True)
+
+
+class Ranking:
+    """Результат ранжирования рецептов в массивах numpy.
+
+    Поддерживает len() и срезы, поэтому пагинатор превращает в
+    кортежи (id рецепта, доля имеющихся ингредиентов, сколько не
+    хватает) только строки запрошенной страницы.
+    """
+
+    def __init__(self, ids, coverage, missing):
+        self.ids = ids
+        self.coverage = coverage
+        self.missing = missing
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return list(zip(
+                self.ids[key].tolist(),
+                self.coverage[key].tolist(),
+                self.missing[key].tolist(),
+            ))
+        return (
+            int(self.ids[key]), float(self.coverage[key]),
+            int(self.missing[key]),
+        )
+
+
+class RecipeIndex:
+    """Копия индекса ингредиентов рецептов в памяти процесса.
+
+    Хранит отсортированные массивы id рецептов по ингредиентам и число
+    ингредиентов каждого рецепта в массиве с индексом по id рецепта,
+    поэтому запросы к индексу не обращаются к базе, а пересечения и
+    подсчеты выполняются numpy. Копия перечитывается из
+    IngredientRecipeIndex при смене версии индекса, версия проверяется
+    не чаще одного раза в CHECK_INTERVAL секунд. Последние
+    RANKING_CACHE_SIZE ранжирований по набору ингредиентов хранятся
+    до смены версии.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.version = None
+        self.checked_at = None
+        self.data = ({}, EMPTY)
+        self.rankings = OrderedDict()
+
+    def build(self):
+        """Метод для чтения индекса из базы"""
+
+        postings = {
+            row.ingredient_id: decode(row.recipe_ids)
+            for row in IngredientRecipeIndex.objects.iterator()
+        }
+        sizes = np.bincount(np.concatenate([EMPTY, *postings.values()]))
+        return postings, sizes
+
+    def invalidate(self):
+        """Метод для проверки версии при следующем запросе"""
+
+        self.checked_at = None
+
+    def refresh(self):
+        """Метод для перечитывания индекса при смене версии"""
+
+        now = time.monotonic()
+        if (self.checked_at is not None
+                and now - self.checked_at < CHECK_INTERVAL):
+            return
+        version = catalog.get_version(VERSION_KEY)['version']
+        with self.lock:
+            if version != self.version:
+                self.data = self.build()
+                self.rankings = OrderedDict()
+                self.version = version
+            self.checked_at = now
+
+    def lookup(self, ingredient_ids):
+        """Метод для получения массивов id рецептов по ингредиентам"""
+
+        self.refresh()
+        postings, _ = self.data
+        return {pk: postings[pk] for pk in ingredient_ids if pk in postings}
+
+    def rank(self, ingredient_ids):
+        """Метод для ранжирования рецептов по имеющимся ингредиентам.
+
+        Число имеющихся ингредиентов каждого рецепта считается одним
+        np.bincount по спискам выбранных ингредиентов.
+        """
+
+        self.refresh()
+        key = frozenset(ingredient_ids)
+        rankings = self.rankings
+        ranked = rankings.get(key)
+        if ranked is not None:
+            rankings.move_to_end(key)
+            return ranked
+        postings, sizes = self.data
+        owned = np.bincount(
+            np.concatenate([EMPTY, *(postings.get(pk, EMPTY) for pk in key)]),
+            minlength=len(sizes),
+        )
+        ids = np.flatnonzero(owned)
+        counts = owned[ids]
+        totals = np.maximum(sizes[ids], counts)
+        coverage = counts / totals
+        missing = totals - counts
+        order = np.lexsort((-ids, missing, -coverage))
+        ranked = Ranking(ids[order], coverage[order], missing[order])
+        rankings[key] = ranked
+        while len(rankings) > RANKING_CACHE_SIZE:
+            rankings.popitem(last=False)
+        return ranked
+
+
+index = RecipeIndex()
+
+
+def lookup(ingredient_ids):
+    """Функция для получения множеств рецептов по ингредиентам"""
+
+    return {
+        pk: set(ids.tolist())
+        for pk, ids in index.lookup(ingredient_ids).items()
+    }
+
+
+class AnyOf(Lookup):
+    """Условие PostgreSQL "поле = ANY(массив)" с одним параметром"""
+
+    lookup_name = 'any_of'
+    prepare_rhs = False
+
+    def as_sql(self, compiler, connection):
+        lhs, params = self.process_lhs(compiler, connection)
+        return f'{lhs} = ANY(%s::bigint[])', [*params, list(self.rhs)]
+
+
+def id_condition(ids):
+    """Функция для условия "id входит в ids".
+
+    На PostgreSQL список передается одним параметром-массивом
+    вместо отдельного параметра на каждый id.
+    """
+
+    ids = list(ids)
+    if connection.vendor != 'postgresql':
+        return Q(id__in=ids)
+    return AnyOf(F('id'), ids)
+
+
+def filter_recipes(queryset, include=(), exclude=()):
+    """Функция для отбора рецептов по ингредиентам.
+
+    Возвращает рецепты, содержащие все ингредиенты include и ни одного
+    из exclude. Пересечение и разность отсортированных массивов id
+    считаются numpy по копии индекса в памяти, к queryset добавляется
+    условие по id.
+    """
+
+    include, exclude = set(include), set(exclude)
+    if not include and not exclude:
+        return queryset
+    postings = index.lookup(include | exclude)
+    excluded = np.unique(np.concatenate(
+        [EMPTY, *(postings.get(pk, EMPTY) for pk in exclude)]
+    ))
+    if not include:
+        return queryset.exclude(id_condition(excluded.tolist()))
+    found = sorted((postings.get(pk, EMPTY) for pk in include), key=len)
+    recipe_ids = reduce(
+        lambda first, second: np.intersect1d(
+            first, second, assume_unique=True
+        ),
+        found,
+    )
+    recipe_ids = np.setdiff1d(recipe_ids, excluded, assume_unique=True)
+    return queryset.filter(id_condition(recipe_ids.tolist()))
+
+
+def rebuild():
+    """Функция для полного пересоздания индекса по IngredientRecipe"""
+
+    with transaction.atomic():
+        IngredientRecipeIndex.objects.all().delete()
+        batch = []
+        ingredient_id, ids = None, array('Q')
+        for pk, recipe_id in IngredientRecipe.objects.order_by(
+            'ingredient_id', 'recipe_id'
+        ).values_list('ingredient_id', 'recipe_id').iterator():
+            if pk != ingredient_id:
+                if ingredient_id is not None:
+                    batch.append(IngredientRecipeIndex(
+                        ingredient_id=ingredient_id,
+                        recipe_ids=ids.tobytes(),
+                    ))
+                ingredient_id, ids = pk, array('Q')
+                if len(batch) >= BATCH_SIZE:
+                    IngredientRecipeIndex.objects.bulk_create(batch)
+                    batch = []
+            ids.append(recipe_id)
+        if ingredient_id is not None:
+            batch.append(IngredientRecipeIndex(
+                ingredient_id=ingredient_id, recipe_ids=ids.tobytes()
+            ))
+        IngredientRecipeIndex.objects.bulk_create(batch)
+        bump_version()
+
+
+def rank_by_pantry(ingredient_ids):
+    """Функция для ранжирования рецептов по имеющимся ингредиентам.
+
+    Для каждого рецепта по спискам индекса в памяти считается, сколько
+    его ингредиентов уже есть у пользователя. Возвращает список
+    кортежей (id рецепта, доля имеющихся ингредиентов, сколько не
+    хватает), отсортированный по убыванию доли и возрастанию
+    недостающих.
+    """
+
+    return index.rank(ingredient_ids)
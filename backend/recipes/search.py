@@ -0,0 +1,103 @@
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector)
+from django.db import connection
+from django.db.models import DurationField, ExpressionWrapper, F, FloatField
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Extract, Now
+
+SEARCH_CONFIG = 'russian'
+RECENCY_DAYS = 30
+SECONDS_IN_DAY = 24 * 60 * 60
+FTS_TABLE = 'recipes_recipe_fts'
+FTS_WEIGHTS = (10.0, 1.0)
+
+
+def search_vector():
+    """Функция, описывающая поисковый вектор рецепта"""
+
+    return (
+        SearchVector('name', weight='A', config=SEARCH_CONFIG)
+        + SearchVector('text', weight='B', config=SEARCH_CONFIG)
+    )
+
+
+def full_text_available():
+    return connection.vendor == 'postgresql'
+
+
+def update_search_vector(queryset):
+    """Функция для пересчета поискового вектора рецептов.
+
+    На SQLite вместо поля search_vector обновляются строки таблицы
+    FTS5 recipes_recipe_fts.
+    """
+
+    if full_text_available():
+        queryset.update(search_vector=search_vector())
+    elif connection.vendor == 'sqlite':
+        sql, params = queryset.values('id').query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({sql})', params
+            )
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE}(rowid, name, text) '
+                f'SELECT id, name, text FROM recipes_recipe '
+                f'WHERE id IN ({sql})',
+                params,
+            )
+
+
+def search_recipes(queryset, value):
+    """Функция для поиска рецептов по названию и описанию.
+
+    На PostgreSQL используется полнотекстовый поиск по search_vector
+    с GIN-индексом и русской морфологией. Релевантность понижается
+    с возрастом рецепта: через RECENCY_DAYS дней вес вдвое меньше.
+    На SQLite (локальный запуск и тесты) используется таблица FTS5.
+    """
+
+    value = value.strip()
+    if not value:
+        return queryset
+    if not full_text_available():
+        return search_recipes_fts5(queryset, value)
+    query = SearchQuery(value, config=SEARCH_CONFIG, search_type='websearch')
+    age = Extract(
+        ExpressionWrapper(Now() - F('created'), output_field=DurationField()),
+        'epoch',
+    ) / SECONDS_IN_DAY
+    return queryset.filter(search_vector=query).annotate(
+        search_rank=ExpressionWrapper(
+            SearchRank(F('search_vector'), query)
+            / (1 + age / RECENCY_DAYS),
+            output_field=FloatField(),
+        )
+    ).order_by('-search_rank', '-created', '-id')
+
+
+def search_recipes_fts5(queryset, value):
+    """Функция для поиска рецептов по таблице FTS5 на SQLite.
+
+    Каждое слово запроса ищется как префикс, чтобы находились другие
+    формы слова. Релевантность - bm25 с весами FTS_WEIGHTS для
+    названия и описания.
+    """
+
+    match = ' '.join(
+        f'"{word}"*' for word in value.replace('"', '""').split()
+    )
+    weights = ', '.join(str(weight) for weight in FTS_WEIGHTS)
+    return queryset.annotate(
+        search_rank=RawSQL(
+            f'SELECT -bm25({FTS_TABLE}, {weights}) FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s AND rowid = recipes_recipe.id',
+            (match,),
+            output_field=FloatField(),
+        )
+    ).filter(
+        id__in=RawSQL(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+            (match,),
+        )
+    ).order_by('-search_rank', '-created', '-id')
@@ -0,0 +1,184 @@
+from collections import Counter
+
+from django.db import connection, transaction
+from django.db.models import Case, F, PositiveIntegerField, Sum, Value, When
+from django.db.models.functions import Greatest
+
+from .models import IngredientRecipe, ShoppingCart, ShoppingListItem
+
+BATCH_SIZE = 1000
+
+
+def recipe_amounts(recipe_id):
+    """Функция для получения количества ингредиентов в рецепте"""
+
+    return Counter(dict(
+        IngredientRecipe.objects.filter(
+            recipe_id=recipe_id
+        ).values_list('ingredient_id', 'amount')
+    ))
+
+
+def insert_amounts(rows):
+    """Функция для прибавления количеств к спискам покупок.
+
+    rows - список (id пользователя, id ингредиента, количество > 0).
+    Существующие строки увеличиваются в самом UPSERT, поэтому
+    параллельные изменения одного списка не теряются.
+    """
+
+    quote = connection.ops.quote_name
+    table = quote(ShoppingListItem._meta.db_table)
+    for start in range(0, len(rows), BATCH_SIZE):
+        batch = rows[start:start + BATCH_SIZE]
+        values = ', '.join(['(%s, %s, %s)'] * len(batch))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {table} (user_id, ingredient_id, total_amount) '
+                f'VALUES {values} ON CONFLICT (user_id, ingredient_id) '
+                f'DO UPDATE SET total_amount = '
+                f'{table}.total_amount + EXCLUDED.total_amount',
+                [value for row in batch for value in row],
+            )
+
+
+def apply_changes(user_ids, changes):
+    """Функция для изменения списков покупок пользователей.
+
+    changes - словарь {id ингредиента: изменение количества}, который
+    применяется к спискам покупок всех переданных пользователей.
+    Прибавление и вычитание выполняются в базе относительно текущего
+    значения, строки с нулевым количеством удаляются.
+    """
+
+    changes = {key: value for key, value in changes.items() if value}
+    user_ids = list(user_ids)
+    if not changes or not user_ids:
+        return
+    added = [
+        (user_id, ingredient_id, change)
+        for user_id in user_ids
+        for ingredient_id, change in changes.items()
+        if change > 0
+    ]
+    removed = {
+        ingredient_id: -change
+        for ingredient_id, change in changes.items()
+        if change < 0
+    }
+    with transaction.atomic():
+        insert_amounts(added)
+        if removed:
+            items = ShoppingListItem.objects.filter(
+                user_id__in=user_ids, ingredient_id__in=removed
+            )
+            items.update(total_amount=Greatest(
+                F('total_amount') - Case(
+                    *(When(ingredient_id=pk, then=Value(amount))
+                      for pk, amount in removed.items()),
+                    output_field=PositiveIntegerField(),
+                ),
+                0,
+            ))
+            items.filter(total_amount=0).delete()
+
+
+def add_recipes(user_id, recipe_ids):
+    """Функция для добавления ингредиентов пачки рецептов в список"""
+
+    apply_changes((user_id,), dict(
+        IngredientRecipe.objects.filter(recipe_id__in=recipe_ids).values(
+            'ingredient_id'
+        ).annotate(total=Sum('amount')).values_list('ingredient_id', 'total')
+    ))
+
+
+def remove_recipes(user_id, recipe_ids):
+    """Функция для удаления ингредиентов пачки рецептов из списка"""
+
+    apply_changes((user_id,), {
+        ingredient_id: -total
+        for ingredient_id, total in IngredientRecipe.objects.filter(
+            recipe_id__in=recipe_ids
+        ).values('ingredient_id').annotate(
+            total=Sum('amount')
+        ).values_list('ingredient_id', 'total')
+    })
+
+
+def add_recipe(user_id, recipe_id):
+    """Функция для добавления ингредиентов рецепта в список покупок"""
+
+    apply_changes((user_id,), recipe_amounts(recipe_id))
+
+
+def remove_recipe(user_id, recipe_id):
+    """Функция для удаления ингредиентов рецепта из списка покупок"""
+
+    changes = {key: -value for key, value in recipe_amounts(recipe_id).items()}
+    apply_changes((user_id,), changes)
+
+
+def change_recipe(recipe_id, old_amounts, new_amounts):
+    """Функция для пересчета списков покупок при изменении рецепта"""
+
+    changes = Counter(new_amounts)
+    changes.subtract(old_amounts)
+    apply_changes(
+        ShoppingCart.objects.filter(
+            recipe_id=recipe_id
+        ).values_list('user_id', flat=True),
+        changes,
+    )
+
+
+def aggregate():
+    """Функция для подсчета списков покупок напрямую по корзинам"""
+
+    return IngredientRecipe.objects.filter(
+        recipe__shopping_cart__isnull=False
+    ).values_list(
+        'recipe__shopping_cart__user_id', 'ingredient_id'
+    ).annotate(total=Sum('amount')).order_by()
+
+
+def rebuild():
+    """Функция для полного пересоздания списков покупок"""
+
+    with transaction.atomic():
+        ShoppingListItem.objects.all().delete()
+        batch = []
+        for user_id, ingredient_id, total in aggregate().iterator():
+            batch.append(ShoppingListItem(
+                user_id=user_id,
+                ingredient_id=ingredient_id,
+                total_amount=total,
+            ))
+            if len(batch) >= BATCH_SIZE:
+                ShoppingListItem.objects.bulk_create(batch)
+                batch = []
+        ShoppingListItem.objects.bulk_create(batch)
+
+
+def verify():
+    """Функция для поиска расхождений списков покупок с корзинами.
+
+    Возвращает словарь {(id пользователя, id ингредиента):
+    (количество в таблице, количество по корзинам)}.
+    """
+
+    expected = {
+        (user_id, ingredient_id): total
+        for user_id, ingredient_id, total in aggregate().iterator()
+    }
+    mismatches = {}
+    for user_id, ingredient_id, total in ShoppingListItem.objects.values_list(
+        'user_id', 'ingredient_id', 'total_amount'
+    ).iterator():
+        key = (user_id, ingredient_id)
+        expected_total = expected.pop(key, 0)
+        if total != expected_total:
+            mismatches[key] = (total, expected_total)
+    for key, expected_total in expected.items():
+        mismatches[key] = (0, expected_total)
+    return mismatches
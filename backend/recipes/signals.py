@@ -0,0 +1,107 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from jobs.queue import enqueue
+from users.models import CustomUser, Follow
+
+from . import catalog, counters
+from .images import delete_renditions
+from .ingredient_index import index
+from .models import Favorite, Ingredient, Recipe, ShoppingCart, Tag
+from .search import update_search_vector
+from .tasks import make_recipe_renditions
+
+
+def refresh_catalog():
+    """Меняем версию справочников и сбрасываем индекс ингредиентов"""
+
+    catalog.bump_version()
+    index.invalidate()
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+@receiver((post_save, post_delete), sender=Tag)
+def catalog_changed(**kwargs):
+    """Обновляем справочники после сохранения изменений"""
+
+    transaction.on_commit(refresh_catalog)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(instance, created, update_fields=None, **kwargs):
+    """Пересчитываем поисковый вектор при изменении текста рецепта.
+
+    Сохранения, не менявшие название и описание (счетчики, фото),
+    вектор не трогают. Если текст при загрузке был отложен,
+    вектор пересчитывается.
+    """
+
+    if update_fields is not None and not {'name', 'text'} & set(
+        update_fields
+    ):
+        return
+    text = (instance.name, instance.text)
+    if not created and getattr(instance, 'indexed_text', None) == text:
+        return
+    update_search_vector(Recipe.objects.filter(pk=instance.pk))
+    instance.indexed_text = text
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_image_saved(instance, update_fields=None, **kwargs):
+    """Ставим в очередь создание копий нового фото рецепта"""
+
+    if update_fields is not None and 'image' not in update_fields:
+        return
+    renditions = instance.image_renditions or {}
+    if renditions.get('source') != (instance.image.name or None):
+        enqueue(make_recipe_renditions, unique=True, recipe_id=instance.pk)
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(instance, **kwargs):
+    """Удаляем копии фото и уменьшаем счетчик рецептов автора.
+
+    Строки рецепта в базе уже нет, поэтому отложенные поля (.only())
+    читаются только из __dict__: обращение к ним вызвало бы запрос,
+    который завершится Recipe.DoesNotExist. Если author_id отложен,
+    счетчик не меняется и исправляется командой recount.
+    """
+
+    values = instance.__dict__
+    if 'image' in values and 'image_renditions' in values:
+        delete_renditions(
+            instance.image_renditions or {}, instance.image.storage
+        )
+    author_id = values.get('author_id')
+    if author_id is not None:
+        counters.change(CustomUser, (author_id,), 'recipes_count', -1)
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_save, sender=Follow)
+def link_saved(sender, instance, created, **kwargs):
+    """Увеличиваем счетчики избранного, корзин и подписок"""
+
+    if created:
+        target = instance.author_id if sender is Follow else instance.recipe_id
+        counters.links_changed(sender, instance.user_id, (target,), 1)
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingCart)
+@receiver(post_delete, sender=Follow)
+def link_deleted(sender, instance, **kwargs):
+    """Уменьшаем счетчики избранного, корзин и подписок"""
+
+    target = instance.author_id if sender is Follow else instance.recipe_id
+    counters.links_changed(sender, instance.user_id, (target,), -1)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_created(instance, created, **kwargs):
+    """Увеличиваем счетчик рецептов автора"""
+
+    if created:
+        counters.change(CustomUser, (instance.author_id,), 'recipes_count', 1)
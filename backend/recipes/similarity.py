@@ -0,0 +1,190 @@
+import random
+from array import array
+from collections import Counter, defaultdict
+from hashlib import blake2b
+
+from django.db import transaction
+from django.db.models import F, Q, Window
+from django.db.models.functions import RowNumber
+
+from .models import (IngredientRecipe, Recipe, RecipeBucket, RecipeSignature,
+                     TagRecipe)
+
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+PRIME = (1 << 61) - 1
+MAX_CANDIDATES = 200
+MAX_BUCKET_ROWS = 500
+BATCH_SIZE = 1000
+
+_random = random.Random(20231018)
+PERMUTATIONS = [
+    (_random.randrange(1, PRIME), _random.randrange(0, PRIME))
+    for _ in range(NUM_PERM)
+]
+
+
+def features(ingredient_ids, tag_ids):
+    """Функция для перевода ингредиентов и тегов в одно множество чисел"""
+
+    return (
+        {pk * 2 for pk in ingredient_ids} | {pk * 2 + 1 for pk in tag_ids}
+    )
+
+
+def minhash(values):
+    """Функция для вычисления MinHash-сигнатуры множества"""
+
+    if not values:
+        return array('Q', [PRIME] * NUM_PERM)
+    return array('Q', (
+        min((a * value + b) % PRIME for value in values)
+        for a, b in PERMUTATIONS
+    ))
+
+
+def band_hashes(signature):
+    """Функция для вычисления хэшей полос сигнатуры"""
+
+    return [
+        int.from_bytes(
+            blake2b(
+                signature[band * ROWS:(band + 1) * ROWS].tobytes(),
+                digest_size=8,
+            ).digest(),
+            'big',
+            signed=True,
+        )
+        for band in range(BANDS)
+    ]
+
+
+def decode(value):
+    """Функция для чтения сигнатуры из поля модели"""
+
+    signature = array('Q')
+    signature.frombytes(bytes(value))
+    return signature
+
+
+def similarity(first, second):
+    """Функция для оценки сходства Жаккара по двум сигнатурам"""
+
+    return sum(a == b for a, b in zip(first, second)) / NUM_PERM
+
+
+def build_objects(recipe_id, ingredient_ids, tag_ids):
+    """Функция для создания сигнатуры и корзин рецепта"""
+
+    signature = minhash(features(ingredient_ids, tag_ids))
+    buckets = [
+        RecipeBucket(recipe_id=recipe_id, band=band, hash=value)
+        for band, value in enumerate(band_hashes(signature))
+    ]
+    return RecipeSignature(
+        recipe_id=recipe_id, signature=signature.tobytes()
+    ), buckets
+
+
+def index_recipe(recipe_id, ingredient_ids, tag_ids):
+    """Функция для добавления или обновления рецепта в индексе LSH"""
+
+    signature, buckets = build_objects(recipe_id, ingredient_ids, tag_ids)
+    with transaction.atomic():
+        RecipeBucket.objects.filter(recipe_id=recipe_id).delete()
+        RecipeSignature.objects.bulk_create(
+            (signature,),
+            update_conflicts=True,
+            unique_fields=('recipe',),
+            update_fields=('signature',),
+        )
+        RecipeBucket.objects.bulk_create(buckets)
+
+
+def index_recipes(recipes):
+    """Функция для добавления в индекс пачки новых рецептов.
+
+    recipes - итерируемый объект из кортежей
+    (id рецепта, id ингредиентов, id тегов).
+    """
+
+    signatures = []
+    buckets = []
+    for recipe_id, ingredient_ids, tag_ids in recipes:
+        signature, recipe_buckets = build_objects(
+            recipe_id, ingredient_ids, tag_ids
+        )
+        signatures.append(signature)
+        buckets.extend(recipe_buckets)
+    with transaction.atomic():
+        RecipeSignature.objects.bulk_create(signatures, batch_size=BATCH_SIZE)
+        RecipeBucket.objects.bulk_create(buckets, batch_size=BATCH_SIZE)
+
+
+def similar_recipes(recipe_id, limit):
+    """Функция для поиска похожих рецептов.
+
+    Кандидаты - рецепты, попавшие хотя бы в одну общую корзину LSH.
+    Из каждой корзины база отдает не больше MAX_BUCKET_ROWS самых
+    новых рецептов, поэтому популярная корзина не разворачивается
+    целиком. Из кандидатов берутся MAX_CANDIDATES с наибольшим числом
+    общих корзин,
+    сходство оценивается по сигнатурам. Возвращает список пар
+    (id рецепта, сходство) по убыванию сходства.
+    """
+
+    row = RecipeSignature.objects.filter(recipe_id=recipe_id).first()
+    if row is None:
+        return []
+    signature = decode(row.signature)
+    condition = Q()
+    for band, value in enumerate(band_hashes(signature)):
+        condition |= Q(band=band, hash=value)
+    collisions = Counter(
+        RecipeBucket.objects.filter(condition).exclude(
+            recipe_id=recipe_id
+        ).annotate(position=Window(
+            RowNumber(), partition_by=F('band'), order_by=F('recipe_id').desc()
+        )).filter(position__lte=MAX_BUCKET_ROWS).values_list(
+            'recipe_id', flat=True
+        )
+    )
+    candidates = [pk for pk, _ in collisions.most_common(MAX_CANDIDATES)]
+    scored = [
+        (other.recipe_id, similarity(signature, decode(other.signature)))
+        for other in RecipeSignature.objects.filter(recipe_id__in=candidates)
+    ]
+    scored.sort(key=lambda item: (-item[1], -item[0]))
+    return scored[:limit]
+
+
+def rebuild():
+    """Функция для полного пересоздания индекса LSH по пачкам рецептов.
+
+    Выполняется в одной транзакции: до ее фиксации поиск похожих
+    рецептов работает по старому индексу, а при ошибке он остается
+    нетронутым.
+    """
+
+    with transaction.atomic():
+        RecipeBucket.objects.all().delete()
+        RecipeSignature.objects.all().delete()
+        recipe_ids = Recipe.objects.order_by('id').values_list('id', flat=True)
+        last_id = 0
+        while True:
+            batch = list(recipe_ids.filter(id__gt=last_id)[:BATCH_SIZE])
+            if not batch:
+                break
+            last_id = batch[-1]
+            ingredients = defaultdict(set)
+            for pk, ingredient_id in IngredientRecipe.objects.filter(
+                recipe_id__in=batch
+            ).values_list('recipe_id', 'ingredient_id'):
+                ingredients[pk].add(ingredient_id)
+            tags = defaultdict(set)
+            for pk, tag_id in TagRecipe.objects.filter(
+                recipe_id__in=batch
+            ).values_list('recipe_id', 'tag_id'):
+                tags[pk].add(tag_id)
+            index_recipes((pk, ingredients[pk], tags[pk]) for pk in batch)
@@ -0,0 +1,39 @@
+from django.db import transaction
+from jobs.queue import task
+
+from . import recipe_index, shopping_list
+from .images import delete_renditions, make_renditions
+from .models import Recipe
+
+
+def refresh_renditions(recipe):
+    """Функция для пересоздания копий фото, если фото сменилось"""
+
+    renditions = recipe.image_renditions or {}
+    if renditions.get('source') == (recipe.image.name or None):
+        return
+    delete_renditions(renditions, recipe.image.storage)
+    renditions = make_renditions(recipe.image) if recipe.image else {}
+    Recipe.objects.filter(pk=recipe.pk).update(image_renditions=renditions)
+    recipe.image_renditions = renditions
+
+
+@task
+def make_recipe_renditions(recipe_id):
+    """Задача для создания уменьшенных копий фото рецепта"""
+
+    recipe = Recipe.objects.only('id', 'image', 'image_renditions').filter(
+        pk=recipe_id
+    ).first()
+    if recipe is not None:
+        refresh_renditions(recipe)
+
+
+def delete_recipe(recipe):
+    """Функция для удаления рецепта из списков покупок, индекса и базы"""
+
+    with transaction.atomic():
+        amounts = shopping_list.recipe_amounts(recipe.id)
+        shopping_list.change_recipe(recipe.id, amounts, {})
+        recipe_index.update_index(recipe.id, removed=amounts)
+        recipe.delete()
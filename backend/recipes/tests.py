@@ -0,0 +1,440 @@
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from django.urls import reverse
+from jobs.models import Job
+from users.models import CustomUser
+
+from . import recipe_index, shopping_list, similarity
+from .management.commands import add_ingredients_from_data
+from .models import (Ingredient, IngredientRecipe, IngredientRecipeIndexChange,
+                     Recipe, RecipeSignature, ShoppingCart, ShoppingListItem)
+from .search import search_recipes
+from .tasks import delete_recipe
+
+
+class RecipeAdminTest(TestCase):
+    """Тесты изменения связей рецепта через админку"""
+
+    def setUp(self):
+        self.admin = CustomUser.objects.create_superuser(
+            email='admin@example.com', username='admin',
+            first_name='Админ', last_name='Сайта', password='password',
+        )
+        self.client.force_login(self.admin)
+        self.recipe = Recipe.objects.create(
+            author=self.admin, name='Рецепт', text='Описание',
+            cooking_time=10,
+        )
+        self.ingredient = Ingredient.objects.create(
+            name='Соль', measurement_unit='г'
+        )
+        ShoppingCart.objects.create(user=self.admin, recipe=self.recipe)
+
+    def shopping_list(self):
+        return dict(
+            ShoppingListItem.objects.filter(user=self.admin).values_list(
+                'ingredient_id', 'total_amount'
+            )
+        )
+
+    def test_add_and_delete_ingredient(self):
+        response = self.client.post(
+            reverse('admin:recipes_ingredientrecipe_add'),
+            {
+                'recipe': self.recipe.pk,
+                'ingredient': self.ingredient.pk,
+                'amount': 5,
+            },
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe_index.apply_changes()
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.shopping_list(), {self.ingredient.pk: 5})
+        self.assertEqual(
+            recipe_index.lookup((self.ingredient.pk,)),
+            {self.ingredient.pk: {self.recipe.pk}},
+        )
+
+        link = IngredientRecipe.objects.get()
+        response = self.client.post(
+            reverse('admin:recipes_ingredientrecipe_delete', args=(link.pk,)),
+            {'post': 'yes'},
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe_index.apply_changes()
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.shopping_list(), {})
+        self.assertEqual(
+            recipe_index.lookup((self.ingredient.pk,)),
+            {self.ingredient.pk: set()},
+        )
+
+    def test_delete_recipe(self):
+        IngredientRecipe.objects.create(
+            recipe=self.recipe, ingredient=self.ingredient, amount=5
+        )
+        ShoppingListItem.objects.create(
+            user=self.admin, ingredient=self.ingredient, total_amount=5
+        )
+        response = self.client.post(
+            reverse('admin:recipes_recipe_delete', args=(self.recipe.pk,)),
+            {'post': 'yes'},
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(Recipe.objects.exists())
+        self.assertEqual(self.shopping_list(), {})
+
+    def test_cart_add_and_delete(self):
+        ShoppingCart.objects.all().delete()
+        IngredientRecipe.objects.create(
+            recipe=self.recipe, ingredient=self.ingredient, amount=5
+        )
+        response = self.client.post(
+            reverse('admin:recipes_shoppingcart_add'),
+            {'user': self.admin.pk, 'recipe': self.recipe.pk},
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.shopping_list(), {self.ingredient.pk: 5})
+        cart = ShoppingCart.objects.get()
+        response = self.client.post(
+            reverse('admin:recipes_shoppingcart_delete', args=(cart.pk,)),
+            {'post': 'yes'},
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.shopping_list(), {})
+
+    def test_delete_ingredient(self):
+        IngredientRecipe.objects.create(
+            recipe=self.recipe, ingredient=self.ingredient, amount=5
+        )
+        response = self.client.post(
+            reverse(
+                'admin:recipes_ingredient_delete', args=(self.ingredient.pk,)
+            ),
+            {'post': 'yes'},
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(
+            RecipeSignature.objects.filter(recipe=self.recipe).exists()
+        )
+
+    def test_shopping_list_is_read_only(self):
+        shopping_list.add_recipes(self.admin.pk, (self.recipe.pk,))
+        response = self.client.get(
+            reverse('admin:recipes_shoppinglistitem_add')
+        )
+        self.assertEqual(response.status_code, 403)
+
+
+class SearchRecipesTest(TestCase):
+    """Тесты поиска рецептов по названию и описанию"""
+
+    def setUp(self):
+        author = CustomUser.objects.create_user(
+            email='author@example.com', username='author',
+            first_name='Автор', last_name='Рецептов', password='password',
+        )
+        self.borscht = Recipe.objects.create(
+            author=author, name='Борщ', text='Суп со свеклой',
+            cooking_time=60,
+        )
+        self.soup = Recipe.objects.create(
+            author=author, name='Суп гороховый', text='Горох и бекон',
+            cooking_time=90,
+        )
+
+    def search(self, value):
+        return list(
+            search_recipes(Recipe.objects.all(), value).values_list(
+                'id', flat=True
+            )
+        )
+
+    def test_name_matches_first(self):
+        self.assertEqual(self.search('суп'), [self.soup.pk, self.borscht.pk])
+
+    def test_all_words_and_prefixes(self):
+        self.assertEqual(self.search('СУП свекл'), [self.borscht.pk])
+        self.assertEqual(self.search('суп "бекон'), [self.soup.pk])
+
+    def test_index_follows_changes(self):
+        self.borscht.name = 'Свекольник'
+        self.borscht.text = 'Холодный'
+        self.borscht.save()
+        self.assertEqual(self.search('суп'), [self.soup.pk])
+        self.assertEqual(self.search('свекольник'), [self.borscht.pk])
+
+    def test_index_skips_unchanged_text(self):
+        recipe = Recipe.objects.get(pk=self.soup.pk)
+        with mock.patch('recipes.signals.update_search_vector') as update:
+            recipe.cooking_time = 30
+            recipe.save()
+            recipe.save(update_fields=('name', 'text'))
+            Recipe.objects.only('id', 'cooking_time').get(
+                pk=self.soup.pk
+            ).save()
+            self.assertFalse(update.called)
+            recipe.text = 'Горох'
+            recipe.save()
+            self.assertEqual(update.call_count, 1)
+
+
+class ShoppingListTest(TestCase):
+    """Тесты поддержки итоговых списков покупок"""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            email='user@example.com', username='user',
+            first_name='Имя', last_name='Фамилия', password='password',
+        )
+        self.salt, self.sugar = (
+            Ingredient.objects.create(name=name, measurement_unit='г')
+            for name in ('Соль', 'Сахар')
+        )
+        self.recipes = []
+        for salt, sugar in ((5, 10), (3, 0)):
+            recipe = Recipe.objects.create(
+                author=self.user, name=f'Рецепт {salt}', text='Описание',
+                cooking_time=10,
+            )
+            IngredientRecipe.objects.create(
+                recipe=recipe, ingredient=self.salt, amount=salt
+            )
+            if sugar:
+                IngredientRecipe.objects.create(
+                    recipe=recipe, ingredient=self.sugar, amount=sugar
+                )
+            self.recipes.append(recipe.pk)
+
+    def totals(self):
+        return dict(
+            ShoppingListItem.objects.filter(user=self.user).values_list(
+                'ingredient_id', 'total_amount'
+            )
+        )
+
+    def test_adds_are_summed(self):
+        shopping_list.add_recipes(self.user.pk, self.recipes)
+        shopping_list.add_recipe(self.user.pk, self.recipes[0])
+        self.assertEqual(
+            self.totals(), {self.salt.pk: 13, self.sugar.pk: 20}
+        )
+        self.assertEqual(shopping_list.verify(), {
+            (self.user.pk, self.salt.pk): (13, 0),
+            (self.user.pk, self.sugar.pk): (20, 0),
+        })
+
+    def test_changes_apply_to_current_total(self):
+        shopping_list.add_recipe(self.user.pk, self.recipes[0])
+        ShoppingListItem.objects.filter(ingredient=self.salt).update(
+            total_amount=100
+        )
+        shopping_list.apply_changes((self.user.pk,), {self.salt.pk: 7})
+        self.assertEqual(
+            self.totals(), {self.salt.pk: 107, self.sugar.pk: 10}
+        )
+
+    def test_remove_deletes_empty_rows(self):
+        shopping_list.add_recipes(self.user.pk, self.recipes)
+        shopping_list.remove_recipe(self.user.pk, self.recipes[0])
+        self.assertEqual(self.totals(), {self.salt.pk: 3})
+        shopping_list.apply_changes(
+            (self.user.pk,), {self.salt.pk: -10, self.sugar.pk: -1}
+        )
+        self.assertEqual(self.totals(), {})
+
+    def test_change_recipe_updates_carts(self):
+        ShoppingCart.objects.create(user=self.user, recipe_id=self.recipes[1])
+        shopping_list.add_recipe(self.user.pk, self.recipes[1])
+        old = shopping_list.recipe_amounts(self.recipes[1])
+        IngredientRecipe.objects.filter(recipe_id=self.recipes[1]).update(
+            amount=4
+        )
+        shopping_list.change_recipe(
+            self.recipes[1], old, shopping_list.recipe_amounts(self.recipes[1])
+        )
+        self.assertEqual(self.totals(), {self.salt.pk: 4})
+        self.assertEqual(shopping_list.verify(), {})
+
+
+class RecipeIndexTest(TestCase):
+    """Тесты индекса рецептов по ингредиентам"""
+
+    def setUp(self):
+        author = CustomUser.objects.create_user(
+            email='author@example.com', username='author',
+            first_name='Автор', last_name='Рецептов', password='password',
+        )
+        self.ingredients = [
+            Ingredient.objects.create(name=name, measurement_unit='г').pk
+            for name in ('Курица', 'Рис', 'Орехи', 'Соль')
+        ]
+        chicken, rice, nuts, salt = self.ingredients
+        self.recipes = []
+        for ingredient_ids in (
+            (chicken, rice), (chicken, rice, nuts), (chicken, salt), (rice,),
+        ):
+            recipe = Recipe.objects.create(
+                author=author, name='Рецепт', text='Описание',
+                cooking_time=10,
+            )
+            IngredientRecipe.objects.bulk_create(
+                IngredientRecipe(recipe=recipe, ingredient_id=pk, amount=1)
+                for pk in ingredient_ids
+            )
+            self.recipes.append(recipe.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe_index.rebuild()
+
+    def filtered(self, include=(), exclude=()):
+        return list(recipe_index.filter_recipes(
+            Recipe.objects.order_by('id'), include, exclude
+        ).values_list('id', flat=True))
+
+    def test_filter_recipes(self):
+        chicken, rice, nuts, _ = self.ingredients
+        first, second, third, fourth = self.recipes
+        self.assertEqual(self.filtered((chicken, rice)), [first, second])
+        self.assertEqual(self.filtered((chicken, rice), (nuts,)), [first])
+        self.assertEqual(
+            self.filtered(exclude=(nuts,)), [first, third, fourth]
+        )
+        self.assertEqual(self.filtered((chicken, 0)), [])
+
+    def test_rank_by_pantry(self):
+        chicken, rice, _, _ = self.ingredients
+        first, second, third, fourth = self.recipes
+        ranked = recipe_index.rank_by_pantry((chicken, rice))
+        self.assertEqual(len(ranked), 4)
+        self.assertEqual(ranked[:], [
+            (fourth, 1.0, 0),
+            (first, 1.0, 0),
+            (second, 2 / 3, 1),
+            (third, 0.5, 1),
+        ])
+        self.assertEqual(ranked[2], (second, 2 / 3, 1))
+
+    def test_edit_and_delete_are_applied_in_batch(self):
+        chicken, rice, nuts, _ = self.ingredients
+        first, second, _, fourth = self.recipes
+        IngredientRecipe.objects.filter(
+            recipe_id=first, ingredient_id=rice
+        ).delete()
+        IngredientRecipe.objects.create(
+            recipe_id=first, ingredient_id=nuts, amount=1
+        )
+        recipe_index.update_index(first, added=(nuts,), removed=(rice,))
+        delete_recipe(Recipe.objects.get(pk=second))
+        self.assertEqual(
+            Job.objects.filter(name=recipe_index.apply_changes.task_name,
+                               status=Job.QUEUED).count(),
+            1,
+        )
+        self.assertEqual(self.filtered((rice,)), [first, fourth])
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe_index.apply_changes()
+        self.assertEqual(self.filtered((rice,)), [fourth])
+        self.assertEqual(recipe_index.lookup((chicken, rice, nuts)), {
+            chicken: {first, self.recipes[2]},
+            rice: {fourth},
+            nuts: {first},
+        })
+        self.assertFalse(
+            IngredientRecipeIndexChange.objects.exists()
+        )
+
+
+class AddIngredientsTest(TestCase):
+    """Тесты загрузки ингредиентов из файла"""
+
+    def setUp(self):
+        Ingredient.objects.create(name='Соль', measurement_unit='г')
+        Ingredient.objects.create(name='Перец', measurement_unit='г')
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'ingredients.json')
+        rows = [
+            {'name': 'Соль', 'measurement_unit': 'кг'},
+            {'name': 'Сахар', 'measurement_unit': 'г'},
+            {'name': 'Перец', 'measurement_unit': 'г'},
+        ]
+        with open(self.path, 'w', encoding='utf-8') as file:
+            json.dump(rows, file, ensure_ascii=False, indent=2)
+
+    def load(self, **options):
+        stdout = StringIO()
+        with mock.patch.object(add_ingredients_from_data, 'CHUNK_SIZE', 7):
+            call_command(
+                'add_ingredients_from_data', file=self.path, stdout=stdout,
+                **options
+            )
+        return stdout.getvalue().splitlines()
+
+    def test_dry_run_shows_diff(self):
+        output = self.load(dry_run=True)
+        self.assertEqual(output[:3], [
+            '~ Соль, кг (в базе: г)',
+            '+ Сахар, г',
+            '- Соль, г',
+        ])
+        self.assertEqual(Ingredient.objects.count(), 2)
+
+    def test_array_is_read_in_chunks(self):
+        self.load()
+        self.assertEqual(
+            set(Ingredient.objects.values_list('name', 'measurement_unit')),
+            {('Соль', 'г'), ('Соль', 'кг'), ('Сахар', 'г'), ('Перец', 'г')},
+        )
+
+    def test_truncated_array(self):
+        with open(self.path, 'w', encoding='utf-8') as file:
+            file.write('[{"name": "Сахар", "measurement_unit": "г"}, ')
+        with self.assertRaises(CommandError):
+            self.load()
+
+
+class SimilarRecipesTest(TestCase):
+    """Тесты индекса похожих рецептов"""
+
+    def setUp(self):
+        author = CustomUser.objects.create_user(
+            email='author@example.com', username='author',
+            first_name='Автор', last_name='Рецептов', password='password',
+        )
+        salt = Ingredient.objects.create(name='Соль', measurement_unit='г')
+        self.recipes = []
+        for _ in range(3):
+            recipe = Recipe.objects.create(
+                author=author, name='Рецепт', text='Описание',
+                cooking_time=10,
+            )
+            IngredientRecipe.objects.create(
+                recipe=recipe, ingredient=salt, amount=1
+            )
+            self.recipes.append(recipe.pk)
+        similarity.rebuild()
+
+    def test_bucket_rows_are_capped(self):
+        first, second, third = self.recipes
+        self.assertEqual(
+            similarity.similar_recipes(first, 10),
+            [(third, 1.0), (second, 1.0)],
+        )
+        with mock.patch.object(similarity, 'MAX_BUCKET_ROWS', 1):
+            self.assertEqual(
+                similarity.similar_recipes(first, 10), [(third, 1.0)]
+            )
+
+    def test_failed_rebuild_keeps_index(self):
+        with mock.patch.object(
+            similarity, 'index_recipes', side_effect=RuntimeError
+        ):
+            with self.assertRaises(RuntimeError):
+                similarity.rebuild()
+        self.assertEqual(RecipeSignature.objects.count(), 3)
@@ -1,19 +1,40 @@
-from django.contrib.admin import ModelAdmin, register
+from django.contrib.admin import register
 from django.contrib.auth.admin import UserAdmin
+from django.db import transaction
+from jobs.queue import enqueue
+from recipes.admin import LargeTableAdmin
 
 from .models import CustomUser, Follow
+from .tasks import delete_user
 
 
 @register(CustomUser)
-class MyUserAdmin(UserAdmin):
+class MyUserAdmin(UserAdmin, LargeTableAdmin):
     list_display = ('pk', 'username', 'email', 'first_name', 'last_name',
-                    'password')
-    list_filter = ('username', 'email')
+                    'password', 'recipes_count', 'followers_count')
+    list_filter = ('is_staff', 'is_active')
     search_fields = ('username', 'email')
 
+    def delete_model(self, request, obj):
+        """Метод, отключающий пользователя и удаляющий его в фоне.
+
+        Как и в API, рецепты удаляются задачей delete_user через
+        delete_recipe, а не каскадом.
+        """
+
+        with transaction.atomic():
+            obj.is_active = False
+            obj.save(update_fields=('is_active',))
+            enqueue(delete_user, user_id=obj.pk)
+
+    def delete_queryset(self, request, queryset):
+        for user in queryset:
+            self.delete_model(request, user)
+
 
 @register(Follow)
-class FollowAdmin(ModelAdmin):
+class FollowAdmin(LargeTableAdmin):
     list_display = ('pk', 'user', 'author')
-    search_fields = ('user', 'author')
-    list_filter = ('user', 'author')
+    list_select_related = ('user', 'author')
+    search_fields = ('user__username', 'author__username')
+    autocomplete_fields = ('user', 'author')
@@ -0,0 +1,23 @@
+from jobs.queue import task
+from recipes.models import Recipe
+from recipes.tasks import delete_recipe
+
+from .models import CustomUser
+
+
+@task
+def delete_user(user_id):
+    """Задача для удаления пользователя вместе с его рецептами.
+
+    Рецепты удаляются по одному через delete_recipe, чтобы списки
+    покупок подписчиков и индексы остались согласованными.
+    """
+
+    user = CustomUser.objects.filter(pk=user_id, is_active=False).first()
+    if user is None:
+        return
+    for recipe in Recipe.objects.filter(author=user).only(
+        'id', 'author_id', 'image', 'image_renditions'
+    ).iterator():
+        delete_recipe(recipe)
+    user.delete()
@@ -0,0 +1,62 @@
+from django.test import TestCase
+from django.urls import reverse
+from jobs.models import Job
+from jobs.queue import claim_job, enqueue, run_job
+from recipes.models import Recipe
+
+from .models import CustomUser
+from .tasks import delete_user
+
+
+class DeleteUserTest(TestCase):
+    """Тесты фонового удаления пользователя"""
+
+    def setUp(self):
+        self.author = CustomUser.objects.create_user(
+            email='author@example.com', username='author',
+            first_name='Автор', last_name='Рецептов', password='password',
+        )
+        self.author.is_active = False
+        self.author.save(update_fields=('is_active',))
+        for number in range(3):
+            Recipe.objects.create(
+                author=self.author, name=f'Рецепт {number}',
+                text='Описание', cooking_time=10,
+            )
+
+    def test_delete_user_with_recipes(self):
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.recipes_count, 3)
+        enqueue(delete_user, user_id=self.author.pk)
+        job = run_job(claim_job())
+        self.assertEqual(job.status, Job.DONE, job.last_error)
+        self.assertFalse(CustomUser.objects.filter(pk=self.author.pk).exists())
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_delete_recipe_with_deferred_fields(self):
+        Recipe.objects.only('id').first().delete()
+        self.assertEqual(Recipe.objects.count(), 2)
+
+
+class UserAdminTest(TestCase):
+    """Тесты удаления пользователя через админку"""
+
+    def test_delete_enqueues_job(self):
+        admin = CustomUser.objects.create_superuser(
+            email='admin@example.com', username='admin',
+            first_name='Админ', last_name='Сайта', password='password',
+        )
+        author = CustomUser.objects.create_user(
+            email='author@example.com', username='author',
+            first_name='Автор', last_name='Рецептов', password='password',
+        )
+        self.client.force_login(admin)
+        response = self.client.post(
+            reverse('admin:users_customuser_delete', args=(author.pk,)),
+            {'post': 'yes'},
+        )
+        self.assertEqual(response.status_code, 302)
+        author.refresh_from_db()
+        self.assertFalse(author.is_active)
+        job = Job.objects.get()
+        self.assertEqual(job.payload, {'user_id': author.pk})